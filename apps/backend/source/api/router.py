@@ -1,6 +1,8 @@
 from fastapi import APIRouter
-from api.routes import auth, user
+from api.routes import auth, playtime, user, users
 
 api_router = APIRouter()
 api_router.include_router(auth.router)
 api_router.include_router(user.router)
+api_router.include_router(users.router)
+api_router.include_router(playtime.router)
@@ -8,6 +8,8 @@ from handlers.user_handler import UserHandler
 from fastapi.responses import RedirectResponse
 import logging
 from utils.auth import create_jwt
+from utils.job_queue import job_queue
+from handlers.backfill_handler import BACKFILL_USER
 
 router = APIRouter(tags=["auth"], prefix='/auth')
 
@@ -21,7 +23,7 @@ async def login():
     return_to = f"{config.BASE_URL}/auth/callback"
     realm = config.BASE_URL
 
-    steam_login_url = SteamClient().get_steam_login_url(return_to, realm)
+    steam_login_url = SteamClient.get_steam_login_url(return_to, realm)
     return RedirectResponse(steam_login_url)
 
 
@@ -41,7 +43,6 @@ async def callback(request: Request):
 
     # we want to check if user exists in our db
     async with UserHandler() as user_handler:
-        steam_client = SteamClient()
         user: User = await user_handler.get_user_by_steam_id(steam_id)
         if user:
             id = user.id
@@ -52,5 +53,11 @@ async def callback(request: Request):
 
             id = await user_handler.create_user_from_steam(user)
 
+            # first snapshot in the background, the login response doesn't wait for it
+            try:
+                await job_queue.enqueue(BACKFILL_USER, str(id), {'user_id': id, 'steam_id': steam_id})
+            except Exception as ex:
+                logging.error(f"Could not queue backfill for user {id}", exc_info=ex)
+
     token = create_jwt(steam_id, id)
     return {"access_token": token, "token_type": "bearer"}
@@ -0,0 +1,64 @@
+from datetime import date, timedelta
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from handlers.playtime_handler import PlaytimeHandler
+from models.jwt import AuthedJWT
+from models.playtime import Granularity, UserPlaytime, UserTopGames
+from utils.auth import get_current_user
+from utils.dependencies import get_playtime_handler
+
+router = APIRouter(tags=["playtime"], prefix='/user')
+
+DEFAULT_RANGE_DAYS = 30
+
+
+def resolve_range(start: Optional[date], end: Optional[date]) -> tuple[date, date]:
+    end = end or date.today()
+    start = start or end - timedelta(days=DEFAULT_RANGE_DAYS)
+    return start, end
+
+
+def resolve_user_id(id: str, jwt: AuthedJWT) -> int:
+    if id == 'me':
+        return int(jwt.id)
+    try:
+        return int(id)
+    except ValueError:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="id must be an integer or 'me'")
+
+
+@router.get("/{id}/playtime")
+async def get_playtime(
+    id,
+    granularity: Granularity = 'day',
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    app_id: Optional[int] = None,
+    jwt: AuthedJWT = Depends(get_current_user),
+    ph: PlaytimeHandler = Depends(get_playtime_handler),
+) -> UserPlaytime:
+    """
+    Playtime per day, week or month between start and end (last 30 days by default), optionally for one app
+    """
+    user_id = resolve_user_id(id, jwt)
+    start, end = resolve_range(start, end)
+    return await ph.get_playtime(user_id, granularity, start, end, app_id)
+
+
+@router.get("/{id}/top-games")
+async def get_top_games(
+    id,
+    granularity: Granularity = 'day',
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    limit: int = Query(10, ge=1, le=100),
+    jwt: AuthedJWT = Depends(get_current_user),
+    ph: PlaytimeHandler = Depends(get_playtime_handler),
+) -> UserTopGames:
+    """
+    Most played games between start and end (last 30 days by default).
+    Use a coarser granularity for long ranges, fewer rollup rows have to be summed.
+    """
+    user_id = resolve_user_id(id, jwt)
+    start, end = resolve_range(start, end)
+    return await ph.get_top_games(user_id, granularity, start, end, limit)
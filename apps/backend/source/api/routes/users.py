@@ -0,0 +1,47 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, status, Depends
+from handlers.user_handler import UserHandler
+from models.jwt import AuthedJWT
+from models.user import UserBatch, UserWithSteam
+from steam.models.steam_user import SteamUser
+from utils.auth import get_current_user
+from utils.dependencies import get_user_handler
+
+router = APIRouter(tags=["user"], prefix='/users')
+
+MAX_BATCH_IDS = 500
+
+
+@router.get("", response_model_by_alias=False)
+async def get_users(
+    ids: str,
+    by_steam_id: Optional[bool] = False,
+    include_steam: Optional[bool] = False,
+    jwt: AuthedJWT = Depends(get_current_user),
+    uh: UserHandler = Depends(get_user_handler),
+) -> UserBatch:
+    """
+    Get many users in one round trip, ids is a comma separated list (may contain 'me').
+    include_steam adds the live steam profile, fetched with one steam call per 100 users.
+    """
+    me = jwt.steam_id if by_steam_id else jwt.id
+    try:
+        requested = [int(me if id.strip() == 'me' else id) for id in ids.split(',') if id.strip()]
+    except ValueError:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail='ids must be a comma separated list of integers')
+
+    if len(requested) > MAX_BATCH_IDS:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail=f'At most {MAX_BATCH_IDS} ids per request')
+
+    users = await uh.get_users(requested, by_steam_id=by_steam_id)
+
+    steam_users = {}
+    if include_steam and users:
+        players = await uh.steam.get_steam_users_raw([str(user.steam_id) for user in users])
+        steam_users = {int(p['steamid']): SteamUser(**p) for p in players}
+
+    found = {user.steam_id if by_steam_id else user.id for user in users}
+    return UserBatch(
+        users=[UserWithSteam(**user.model_dump(), steam=steam_users.get(user.steam_id)) for user in users],
+        not_found=[id for id in dict.fromkeys(requested) if id not in found],
+    )
@@ -0,0 +1,43 @@
+import logging
+from azure.azure_sql_client import AzureSQLClient
+from azure.playtime_writer import PlaytimeWriter
+from steam.steam_client import SteamClient
+
+BACKFILL_USER = 'backfill_user'
+
+
+async def backfill_user(payload: dict):
+    """
+    First GetRecentlyPlayedGames snapshot for a new user, written the same way the hourly import does,
+    so their playtime starts counting from signup instead of from the next cron run.
+    """
+    import polars as pl
+
+    user_id = int(payload['user_id'])
+    steam_id = str(payload['steam_id'])
+
+    async with SteamClient() as steam:
+        games = await steam.get_recently_played_games(steam_id)
+
+    if games.is_empty():
+        logging.info(f"No recently played games to backfill for user {user_id}")
+        return
+
+    apps = games.select(
+        'app_id',
+        'name',
+        SteamClient.img_icon_url_expr().alias('img_url'),
+    )
+    snapshot = games.select(
+        'app_id',
+        pl.lit(user_id, dtype=pl.Int64).alias('user_id'),
+        'playtime_forever',
+    )
+
+    # same writer as the pipeline, an unchanged playtime only refreshes recorded_at
+    async with AzureSQLClient() as sql:
+        writer = PlaytimeWriter(sql)
+        await writer.insert_apps(apps)
+        inserted = await writer.merge_snapshot(snapshot)
+
+    logging.info(f"Backfilled {inserted} playtime rows for user {user_id}")
@@ -0,0 +1,107 @@
+from datetime import date, timedelta
+from typing import Optional
+from models.playtime import Granularity, PlaytimePeriod, TopGame, UserPlaytime, UserTopGames
+from azure.azure_sql_client import AzureSQLClient
+
+
+def period_start(day: date, granularity: Granularity) -> date:
+    """First day of the rollup period containing `day`, weeks start on Monday like in the pipeline."""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+class PlaytimeHandler:
+    """
+    Reads playtime from playtime_rollups only, every query is a range seek on (user_id, granularity, period_start).
+    """
+
+    def __init__(self):
+        self.sql = AzureSQLClient()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self.sql.conn:
+            await self.sql.close()
+
+    async def get_playtime(
+        self,
+        user_id: int,
+        granularity: Granularity,
+        start: date,
+        end: date,
+        app_id: Optional[int] = None,
+    ) -> UserPlaytime:
+        start = period_start(start, granularity)
+        params = [user_id, granularity, start, end]
+        app_filter = ""
+        if app_id is not None:
+            app_filter = "AND app_id = ?"
+            params.append(app_id)
+
+        rows = await self.sql.query(
+            f"""
+            SELECT
+                period_start,
+                SUM(playtime_minutes) AS playtime_minutes
+            FROM playtime_rollups
+            WHERE
+                user_id = ?
+                AND granularity = ?
+                AND period_start BETWEEN ? AND ?
+                {app_filter}
+            GROUP BY period_start
+            ORDER BY period_start
+            """,
+            params,
+        )
+
+        return UserPlaytime(
+            user_id=user_id,
+            granularity=granularity,
+            start=start,
+            end=end,
+            app_id=app_id,
+            periods=[PlaytimePeriod(**row) for row in rows],
+        )
+
+    async def get_top_games(
+        self,
+        user_id: int,
+        granularity: Granularity,
+        start: date,
+        end: date,
+        limit: int = 10,
+    ) -> UserTopGames:
+        start = period_start(start, granularity)
+        rows = await self.sql.query(
+            """
+            SELECT TOP (?)
+                r.app_id,
+                a.name,
+                a.img_url,
+                SUM(r.playtime_minutes) AS playtime_minutes
+            FROM playtime_rollups r
+                LEFT JOIN steam_apps a ON a.app_id = r.app_id
+            WHERE
+                r.user_id = ?
+                AND r.granularity = ?
+                AND r.period_start BETWEEN ? AND ?
+            GROUP BY r.app_id, a.name, a.img_url
+            HAVING SUM(r.playtime_minutes) > 0
+            ORDER BY playtime_minutes DESC
+            """,
+            [limit, user_id, granularity, start, end],
+        )
+
+        return UserTopGames(
+            user_id=user_id,
+            granularity=granularity,
+            start=start,
+            end=end,
+            games=[TopGame(**row) for row in rows],
+        )
@@ -4,9 +4,26 @@ import logging
 from models.user import User
 from steam.steam_client import SteamClient
 from azure.azure_sql_client import AzureSQLClient
+from steam.cache import TTLCache
+from utils.config import config
 
 
 class UserHandler:
+    USER_COLUMNS = """
+        is_active,
+        steam_id,
+        name,
+        id,
+        created_at,
+        paused_at
+    """
+
+    # process wide, every User is stored under ('id', id) and ('steam_id', steam_id)
+    _cache = TTLCache(
+        ttl=float(getattr(config, "USER_CACHE_TTL", 60)),
+        max_size=int(getattr(config, "USER_CACHE_SIZE", 10000)),
+    )
+
     def __init__(self):
         self.sql = AzureSQLClient()
         self.steam = SteamClient()
@@ -17,30 +34,85 @@ class UserHandler:
     async def __aexit__(self, exc_type, exc, tb):
         if self.sql.conn:
             await self.sql.close()
+        await self.steam.close()
 
-    async def get_user(self, id: int) -> User:
-        user = await self.sql.query_one(
+    @classmethod
+    def _cache_user(cls, user: User):
+        cls._cache.set(('id', user.id), user)
+        cls._cache.set(('steam_id', user.steam_id), user)
+
+    @classmethod
+    def invalidate(cls, id: int | None = None, steam_id: int | None = None):
+        if id is not None:
+            cls._cache.pop(('id', int(id)))
+        if steam_id is not None:
+            cls._cache.pop(('steam_id', int(steam_id)))
+
+    async def _get_user_by(self, column: str, value: int) -> User | None:
+        key = (column, int(value))
+        user = self._cache.get(key)
+        if user is not None:
+            return user
+
+        # column is always one of our own literals, only the value is a parameter
+        row = await self.sql.query_one(
             f"""
-            SELECT
-                is_active,
-                steam_id,
-                name,
-                id,
-                created_at,
-                paused_at
+            SELECT {self.USER_COLUMNS}
             FROM user_accounts
             WHERE
-                id = {id}
-            """
+                {column} = ?
+            """,
+            (int(value),),
         )
 
-        if user is None:
+        if row is None:
             return None
-        else:
-            return User(**(user))
+
+        user = User(**row)
+        self._cache_user(user)
+        return user
+
+    async def get_user(self, id: int) -> User:
+        return await self._get_user_by('id', id)
+
+    async def get_users(self, ids: list[int], by_steam_id: bool = False) -> list[User]:
+        """
+        Resolve many users at once, cache hits first, then one IN query per 2000 misses.
+        Users come back in the order asked for, ids that don't exist are left out.
+        """
+        column = 'steam_id' if by_steam_id else 'id'
+        ids = list(dict.fromkeys(int(id) for id in ids))
+
+        users = {}
+        missing = []
+        for id in ids:
+            user = self._cache.get((column, id))
+            if user is None:
+                missing.append(id)
+            else:
+                users[id] = user
+
+        chunk_size = AzureSQLClient.MAX_PARAMS - 100
+        for i in range(0, len(missing), chunk_size):
+            chunk = missing[i:i + chunk_size]
+            rows = await self.sql.query(
+                f"""
+                SELECT {self.USER_COLUMNS}
+                FROM user_accounts
+                WHERE
+                    {column} IN ({", ".join("?" * len(chunk))})
+                """,
+                chunk,
+            )
+            for row in rows:
+                user = User(**row)
+                self._cache_user(user)
+                users[getattr(user, column)] = user
+
+        return [users[id] for id in ids if id in users]
 
     async def create_user_from_steam(self, user: SteamUser) -> int:
-        insert = f"""
+        insert = """
         INSERT INTO user_accounts
             (
                 steam_id,
@@ -49,34 +121,17 @@ class UserHandler:
         OUTPUT INSERTED.id
         VALUES
             (
-                {user.steam_id},
-                '{user.name}'
+                ?,
+                ?
             )
         """
-        res = await self.sql.query_one(insert)
+        res = await self.sql.query_one(insert, (int(user.steam_id), user.name))
         logging.info(f"Inserted user: {res}")
         if not res['id']:
             raise Exception("Could not insert new user")
 
+        self.invalidate(id=res['id'], steam_id=user.steam_id)
         return res['id']
 
     async def get_user_by_steam_id(self, steam_id: int) -> User:
-        user = await self.sql.query_one(
-            f"""
-            SELECT
-                is_active,
-                steam_id,
-                name,
-                id,
-                created_at,
-                paused_at
-            FROM user_accounts
-            WHERE
-                steam_id = {steam_id}
-            """
-        )
-
-        if user is None:
-            return None
-        else:
-            return User(**(user))
+        return await self._get_user_by('steam_id', steam_id)
@@ -1,11 +1,17 @@
 import logging
 import sys
+from contextlib import asynccontextmanager
 
 from api import router
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from handlers.exception_handlers import setup_exception_handlers
 from utils.config import config
+from utils.auth import load_jwt_keys
+from utils.job_queue import job_queue
+from handlers.backfill_handler import BACKFILL_USER, backfill_user
+from steam.steam_client import SteamClient
+from azure.azure_sql_client import AzureSQLClient
 
 logging.basicConfig(
     level=logging.INFO,
@@ -16,7 +22,24 @@ logging.basicConfig(
 
 logging.info("Logger initialized")
 
-app = FastAPI(title=config.APP_NAME, debug=config.LOCAL_DEV)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    load_jwt_keys()
+    # one warm connection pool to steam and one to sql for the whole process
+    await SteamClient.open_shared_client()
+    SteamClient.enable_summary_cache()
+    SteamClient.enable_summary_batching()
+    await AzureSQLClient.open_pool()
+    job_queue.register(BACKFILL_USER, backfill_user)
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+    await AzureSQLClient.close_pool()
+    await SteamClient.close_shared_client()
+
+
+app = FastAPI(title=config.APP_NAME, debug=config.LOCAL_DEV, lifespan=lifespan)
 setup_exception_handlers(app)
 app.include_router(router.api_router)
 
@@ -0,0 +1,34 @@
+from pydantic import BaseModel
+from datetime import date
+from typing import Literal, Optional
+
+Granularity = Literal['day', 'week', 'month']
+
+
+class PlaytimePeriod(BaseModel):
+    period_start: date
+    playtime_minutes: int
+
+
+class UserPlaytime(BaseModel):
+    user_id: int
+    granularity: Granularity
+    start: date
+    end: date
+    app_id: Optional[int] = None
+    periods: list[PlaytimePeriod]
+
+
+class TopGame(BaseModel):
+    app_id: int
+    name: Optional[str]
+    img_url: Optional[str]
+    playtime_minutes: int
+
+
+class UserTopGames(BaseModel):
+    user_id: int
+    granularity: Granularity
+    start: date
+    end: date
+    games: list[TopGame]
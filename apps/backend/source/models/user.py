@@ -1,6 +1,7 @@
 from pydantic import BaseModel, ConfigDict
 from datetime import datetime
 from typing import Optional
+from steam.models.steam_user import SteamUser
 
 
 class User(BaseModel):
@@ -12,3 +13,12 @@ class User(BaseModel):
     created_at: datetime
     paused_at: Optional[datetime]
     is_active: bool
+
+
+class UserWithSteam(User):
+    steam: Optional[SteamUser] = None
+
+
+class UserBatch(BaseModel):
+    users: list[UserWithSteam]
+    not_found: list[int]
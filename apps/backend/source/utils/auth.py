@@ -1,13 +1,32 @@
 from models.jwt import AuthedJWT
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+import hashlib
+import time
 import jwt
 from jwt import PyJWTError
+from jwt.algorithms import RSAAlgorithm
 from datetime import datetime, timedelta
+from steam.cache import TTLCache
 from utils.config import config
 
 security = HTTPBearer()
 
+# parsed key objects, PEM parsing is only done once per process
+_keys: dict = {}
+
+# tokens that already passed verification, keyed by sha256 of the token and dropped at the token's exp
+_verified_tokens = TTLCache(ttl=0, max_size=int(getattr(config, "JWT_CACHE_SIZE", 10000)))
+
+
+def load_jwt_keys():
+    """Parse the PEM keys from config into key objects, called at startup so the first request doesn't pay for it."""
+    if not _keys:
+        rsa = RSAAlgorithm(RSAAlgorithm.SHA256)
+        _keys["private"] = rsa.prepare_key(config.JWT_PRIVATE_KEY)
+        _keys["public"] = rsa.prepare_key(config.JWT_PUBLIC_KEY)
+    return _keys
+
 
 def create_jwt(steam_id: str, user_id: int):
     payload = {
@@ -16,16 +35,21 @@ def create_jwt(steam_id: str, user_id: int):
         "iat": datetime.utcnow(),
         "exp": datetime.utcnow() + timedelta(minutes=int(config.JWT_EXPIRE_MINUTES))
     }
-    return jwt.encode(payload, config.JWT_PRIVATE_KEY, algorithm='RS256')
+    return jwt.encode(payload, load_jwt_keys()["private"], algorithm='RS256')
 
 
-def get_current_user(
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
 ) -> AuthedJWT:
     token = credentials.credentials
 
+    digest = hashlib.sha256(token.encode()).digest()
+    cached = _verified_tokens.get(digest)
+    if cached is not None:
+        return cached
+
     try:
-        payload = jwt.decode(token, config.JWT_PUBLIC_KEY, algorithms=['RS256'])
+        payload = jwt.decode(token, load_jwt_keys()["public"], algorithms=['RS256'])
     except jwt.ExpiredSignatureError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -47,4 +71,8 @@ def get_current_user(
             detail="Token payload invalid",
         )
 
-    return AuthedJWT(**payload)
+    user = AuthedJWT(**payload)
+    # tokens without exp are never cached, they would have to be verified for good
+    if "exp" in payload:
+        _verified_tokens.set(digest, user, ttl=payload["exp"] - time.time())
+    return user
@@ -2,11 +2,20 @@ import os
 
 
 class Config:
-    def __init__(self):
-        for key, value in os.environ.items():
-            if value.lower() in ("true", "false"):
-                value = value.lower() == "true"
-            setattr(self, key.upper(), value)
+    """
+    Environment variables as attributes (config.APP_NAME), "true"/"false" become bools.
+    Looked up on first access instead of copying all of os.environ at import.
+    """
+
+    def __getattr__(self, key):
+        # only called when the attribute isn't cached yet
+        value = os.environ.get(key.upper())
+        if value is None:
+            raise AttributeError(key)
+        if value.lower() in ("true", "false"):
+            value = value.lower() == "true"
+        setattr(self, key.upper(), value)
+        return value
 
     def __getitem__(self, key):
         return getattr(self, key.upper())
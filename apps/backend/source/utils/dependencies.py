@@ -0,0 +1,16 @@
+from typing import AsyncIterator
+from handlers.user_handler import UserHandler
+from handlers.playtime_handler import PlaytimeHandler
+
+
+async def get_user_handler() -> AsyncIterator[UserHandler]:
+    """
+    Per-request UserHandler, borrows a pooled SQL connection and hands it back once the response is built.
+    """
+    async with UserHandler() as uh:
+        yield uh
+
+
+async def get_playtime_handler() -> AsyncIterator[PlaytimeHandler]:
+    async with PlaytimeHandler() as ph:
+        yield ph
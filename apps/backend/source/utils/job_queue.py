@@ -0,0 +1,163 @@
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable
+from azure.azure_sql_client import AzureSQLClient
+from utils.config import config
+
+JobHandler = Callable[[dict], Awaitable[None]]
+
+
+class JobQueue:
+    """
+    Small in-process job queue for work that shouldn't hold up a response.
+
+    Jobs are rows in background_jobs, the asyncio queue only carries their ids to a fixed number of workers.
+    A job is identified by (job_type, job_key), enqueueing one that is already pending or running is a no-op.
+    Whatever is still pending when the process stops is picked up again by the next start.
+    """
+
+    def __init__(
+        self,
+        workers: int = int(getattr(config, "JOB_QUEUE_WORKERS", 2)),
+        max_attempts: int = int(getattr(config, "JOB_QUEUE_MAX_ATTEMPTS", 3)),
+        retry_backoff: float = 30.0,
+        stale_after: int = 600,
+    ):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        # a job still marked running this long after its last update belonged to a process that died
+        self.stale_after = stale_after
+        self.handlers: dict[str, JobHandler] = {}
+        self._queue: asyncio.Queue[int] | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    def register(self, job_type: str, handler: JobHandler):
+        self.handlers[job_type] = handler
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+
+        async with AzureSQLClient() as sql:
+            rows = await sql.query(
+                """
+                SET NOCOUNT ON;
+
+                UPDATE background_jobs
+                SET status = 'pending', updated_at = SYSDATETIME()
+                WHERE status = 'running'
+                    AND updated_at < DATEADD(SECOND, -?, SYSDATETIME());
+
+                SELECT id
+                FROM background_jobs
+                WHERE status = 'pending'
+                ORDER BY id;
+                """,
+                (self.stale_after,),
+            )
+        for row in rows:
+            self._queue.put_nowait(row['id'])
+        if rows:
+            logging.info(f"Resuming {len(rows)} pending background jobs")
+
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def enqueue(self, job_type: str, job_key: str, payload: dict) -> bool:
+        """Persist a job and hand it to the workers, returns False when the same job is already waiting."""
+        async with AzureSQLClient() as sql:
+            row = await sql.query_one(
+                """
+                SET NOCOUNT ON;
+
+                INSERT INTO background_jobs (job_type, job_key, payload)
+                OUTPUT INSERTED.id
+                SELECT ?, ?, ?
+                WHERE NOT EXISTS (
+                    SELECT 1
+                    FROM background_jobs WITH (UPDLOCK, HOLDLOCK)
+                    WHERE job_type = ?
+                        AND job_key = ?
+                        AND status IN ('pending', 'running')
+                );
+                """,
+                (job_type, job_key, json.dumps(payload), job_type, job_key),
+            )
+
+        if row is None:
+            logging.info(f"Job {job_type}:{job_key} is already queued")
+            return False
+
+        # jobs stay in SQL when the queue isn't running, start() picks them up
+        if self._queue is not None:
+            self._queue.put_nowait(row['id'])
+        return True
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as ex:
+                logging.error(f"Background job {job_id} could not be processed", exc_info=ex)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: int):
+        async with AzureSQLClient() as sql:
+            # only one worker in any process gets to move it to running
+            job = await sql.query_one(
+                """
+                UPDATE background_jobs
+                SET status = 'running', attempts = attempts + 1, updated_at = SYSDATETIME()
+                OUTPUT INSERTED.job_type, INSERTED.job_key, INSERTED.payload, INSERTED.attempts
+                WHERE id = ?
+                    AND status = 'pending'
+                """,
+                (job_id,),
+            )
+        if job is None:
+            return
+
+        handler = self.handlers.get(job['job_type'])
+        try:
+            if handler is None:
+                raise ValueError(f"No handler registered for job type {job['job_type']}")
+            await handler(json.loads(job['payload']))
+        except asyncio.CancelledError:
+            # shutting down mid job, leave it for the next start
+            await self._set_status(job_id, 'pending')
+            raise
+        except Exception as ex:
+            retry = job['attempts'] < self.max_attempts
+            logging.warning(f"Job {job['job_type']}:{job['job_key']} failed (attempt {job['attempts']}): {ex}")
+            await self._set_status(job_id, 'pending' if retry else 'failed', str(ex))
+            if retry:
+                delay = self.retry_backoff * 2 ** (job['attempts'] - 1)
+                asyncio.get_running_loop().call_later(delay, self._queue.put_nowait, job_id)
+            return
+
+        await self._set_status(job_id, 'done')
+        logging.info(f"Job {job['job_type']}:{job['job_key']} done")
+
+    async def _set_status(self, job_id: int, status: str, error: str | None = None):
+        async with AzureSQLClient() as sql:
+            await sql.nonquery(
+                """
+                UPDATE background_jobs
+                SET status = ?, last_error = COALESCE(?, last_error), updated_at = SYSDATETIME()
+                WHERE id = ?
+                """,
+                (status, error, job_id),
+            )
+
+
+job_queue = JobQueue()
@@ -14,6 +14,9 @@ CREATE TABLE user_accounts (
     paused_at DATETIME2,
     is_active BIT DEFAULT 1,
     last_log_off DATETIME2 DEFAULT NULL,
+    -- adaptive polling (UTC), NULL means due on the next run
+    next_poll_at DATETIME2 DEFAULT NULL,
+    poll_interval_minutes INT NOT NULL DEFAULT 15,
 );
 GO
 
@@ -51,10 +54,70 @@ CREATE TABLE playtime_forever_historic (
 );
 GO
 
+-- High-water marks for incremental pipeline tasks
+CREATE TABLE pipeline_watermarks (
+    name NVARCHAR(100) NOT NULL PRIMARY KEY,
+    high_water DATETIME2 NOT NULL,
+    -- last row id a task has seen, for tasks where recorded_at can move (see GetPlaytime)
+    high_water_id BIGINT NULL,
+    updated_at DATETIME2 DEFAULT SYSDATETIME()
+);
+GO
+
+-- Leases for sharded pipeline workers, one row per shard per run window.
+-- shard_id -1 is the finalize step that runs once every other shard is complete.
+CREATE TABLE pipeline_shard_leases (
+    job_name NVARCHAR(100) NOT NULL,
+    window_start DATETIME2 NOT NULL,
+    shard_id INT NOT NULL,
+    shard_count INT NOT NULL,
+    owner NVARCHAR(255) NULL,
+    lease_expires_at DATETIME2 NULL,
+    attempts INT NOT NULL DEFAULT 0,
+    completed_at DATETIME2 NULL,
+    CONSTRAINT pk_shard_leases PRIMARY KEY (job_name, window_start, shard_id)
+);
+GO
+
+-- Playtime summed per user/app for each day, week (starting Monday) and month, kept up to date by RollupPlaytime.
+-- The backend reads only this table, so its queries cost the same no matter how much history there is.
+CREATE TABLE playtime_rollups (
+    user_id INT NOT NULL,
+    granularity VARCHAR(5) NOT NULL,
+    period_start DATE NOT NULL,
+    app_id INT NOT NULL,
+    playtime_minutes BIGINT NOT NULL,
+    CONSTRAINT pk_playtime_rollups PRIMARY KEY (user_id, granularity, period_start, app_id),
+    CONSTRAINT fk_rollup_user FOREIGN KEY (user_id) REFERENCES user_accounts(id),
+    CONSTRAINT ck_rollup_granularity CHECK (granularity IN ('day', 'week', 'month'))
+);
+GO
+
+-- Jobs for the backend's in-process queue, pending rows are picked up again after a restart.
+-- The filtered unique index keeps one live job per type and key across every backend process.
+CREATE TABLE background_jobs (
+    id INT IDENTITY(1,1) PRIMARY KEY,
+    job_type NVARCHAR(50) NOT NULL,
+    job_key NVARCHAR(100) NOT NULL,
+    payload NVARCHAR(MAX) NOT NULL,
+    status NVARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    last_error NVARCHAR(MAX) NULL,
+    created_at DATETIME2 NOT NULL DEFAULT SYSDATETIME(),
+    updated_at DATETIME2 NOT NULL DEFAULT SYSDATETIME(),
+    CONSTRAINT ck_background_jobs_status CHECK (status IN ('pending', 'running', 'done', 'failed'))
+);
+GO
+
+CREATE UNIQUE INDEX ux_background_jobs_live ON background_jobs (job_type, job_key) WHERE status IN ('pending', 'running');
+GO
+
 -- Optional indexes for faster queries
 CREATE INDEX idx_daily_user_app ON playtime_calculated(user_id, app_id);
 CREATE INDEX idx_forever_user_app ON playtime_forever_historic(user_id, app_id);
+CREATE INDEX idx_forever_recorded_at ON playtime_forever_historic(recorded_at) INCLUDE (user_id, app_id);
 CREATE INDEX idx_user_accounts_steam_id ON user_accounts (steam_id);
+CREATE INDEX idx_user_accounts_next_poll ON user_accounts (is_active, next_poll_at) INCLUDE (steam_id, last_log_off, poll_interval_minutes);
 GO
 
 
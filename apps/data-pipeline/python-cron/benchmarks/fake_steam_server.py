@@ -0,0 +1,246 @@
+"""
+Local stand-in for the parts of the Steam Web API the project uses:
+    GET  /ISteamUser/GetPlayerSummaries/v2/
+    GET  /IPlayerService/GetRecentlyPlayedGames/v1/
+    POST /openid/login  (openid.mode=check_authentication)
+    GET  /stats         (counters for benchmarks)
+
+Point SteamClient at it with STEAM_BASE_URL=http://localhost:8089 and
+STEAM_OPENID_URL=http://localhost:8089/openid/login.
+
+    python -m benchmarks.fake_steam_server --port 8089 --latency-ms 80 --rate-429 0.02
+"""
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+SUMMARIES_PATH = "/ISteamUser/GetPlayerSummaries/v2/"
+GAMES_PATH = "/IPlayerService/GetRecentlyPlayedGames/v1/"
+OPENID_PATH = "/openid/login"
+
+
+@dataclass
+class FakeSteamConfig:
+    latency_ms: float = 50.0
+    latency_jitter_ms: float = 20.0
+    rate_429: float = 0.0
+    rate_5xx: float = 0.0
+    retry_after: float | None = 1.0
+    online_probability: float = 0.3  # chance a user played since the last poll
+    unconfigured_probability: float = 0.01  # profilestate != 1
+    app_count: int = 5_000
+    max_games_per_user: int = 10
+    seed: int = 42
+
+
+@dataclass
+class FakeSteamStats:
+    calls: dict = field(default_factory=dict)
+    injected_429: int = 0
+    injected_5xx: int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": dict(self.calls),
+            "injected_429": self.injected_429,
+            "injected_5xx": self.injected_5xx,
+        }
+
+
+class FakeSteamState:
+    """Synthetic users and games. Everything is derived from the steam id + seed so runs are repeatable."""
+
+    def __init__(self, config: FakeSteamConfig):
+        self.config = config
+        self.stats = FakeSteamStats()
+        self.lock = threading.Lock()
+        self.rng = random.Random(config.seed)
+        self.users: dict[str, dict] = {}
+
+    def _user(self, steam_id: str) -> dict:
+        user = self.users.get(steam_id)
+        if user is None:
+            rng = random.Random(f"{self.config.seed}:{steam_id}")
+            # zipf-ish popularity, a few apps are played by most users
+            game_count = rng.randint(0, self.config.max_games_per_user)
+            app_ids = {
+                int(self.config.app_count * rng.paretovariate(1.2)) % self.config.app_count + 10
+                for _ in range(game_count)
+            }
+            user = {
+                "profilestate": 0 if rng.random() < self.config.unconfigured_probability else 1,
+                "lastlogoff": int(time.time()) - rng.randint(3600, 86400 * 30),
+                "games": {app_id: rng.randint(0, 50_000) for app_id in app_ids},
+            }
+            self.users[steam_id] = user
+        return user
+
+    def summary(self, steam_id: str) -> dict:
+        user = self._user(steam_id)
+        online = self.rng.random() < self.config.online_probability
+        if online:
+            user["lastlogoff"] = int(time.time())
+            for app_id in user["games"]:
+                user["games"][app_id] += self.rng.randint(0, 60)
+        return {
+            "steamid": steam_id,
+            "communityvisibilitystate": 3,
+            "profilestate": user["profilestate"],
+            "personaname": f"bench_{steam_id[-6:]}",
+            "avatar": "https://avatars.steamstatic.com/fake.jpg",
+            "lastlogoff": user["lastlogoff"],
+            "personastate": 1 if online else 0,
+        }
+
+    def games(self, steam_id: str) -> list[dict]:
+        user = self._user(steam_id)
+        return [
+            {
+                "appid": app_id,
+                "name": f"Game {app_id}",
+                "playtime_2weeks": min(playtime, 20_160),
+                "playtime_forever": playtime,
+                "img_icon_url": f"{app_id:040x}",
+            }
+            for app_id, playtime in user["games"].items()
+        ]
+
+
+class FakeSteamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real api
+    state: FakeSteamState
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: str, content_type: str = "application/json", headers: dict | None = None):
+        payload = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _inject(self, path: str) -> bool:
+        """Simulate latency and maybe answer with an injected error. Returns True if it did."""
+        config = self.state.config
+        time.sleep(max(0.0, config.latency_ms + random.uniform(-1, 1) * config.latency_jitter_ms) / 1000)
+
+        with self.state.lock:
+            self.state.stats.calls[path] = self.state.stats.calls.get(path, 0) + 1
+            roll = self.state.rng.random()
+            if roll < config.rate_429:
+                self.state.stats.injected_429 += 1
+                status = 429
+            elif roll < config.rate_429 + config.rate_5xx:
+                self.state.stats.injected_5xx += 1
+                status = 503
+            else:
+                return False
+
+        headers = {"Retry-After": str(config.retry_after)} if status == 429 and config.retry_after else None
+        self._send(status, json.dumps({}), headers=headers)
+        return True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        if url.path == "/stats":
+            with self.state.lock:
+                self._send(200, json.dumps(self.state.stats.to_dict()))
+            return
+
+        if url.path not in (SUMMARIES_PATH, GAMES_PATH):
+            self._send(404, json.dumps({}))
+            return
+
+        if self._inject(url.path):
+            return
+
+        with self.state.lock:
+            if url.path == SUMMARIES_PATH:
+                steam_ids = query.get("steamids", [""])[0].split(",")
+                body = {"response": {"players": [self.state.summary(id) for id in steam_ids if id]}}
+            else:
+                steam_id = query.get("steamid", [""])[0]
+                games = self.state.games(steam_id)
+                body = {"response": {"total_count": len(games), "games": games}}
+
+        self._send(200, json.dumps(body))
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode())
+
+        if url.path != OPENID_PATH:
+            self._send(404, json.dumps({}))
+            return
+
+        if self._inject(url.path):
+            return
+
+        valid = form.get("openid.mode", [""])[0] == "check_authentication"
+        body = f"ns:http://specs.openid.net/auth/2.0\nis_valid:{'true' if valid else 'false'}\n"
+        self._send(200, body, content_type="text/plain")
+
+
+def start_server(config: FakeSteamConfig, host: str = "127.0.0.1", port: int = 8089) -> tuple[ThreadingHTTPServer, FakeSteamState]:
+    """Start the fake server on a background thread and return it with its state."""
+    state = FakeSteamState(config)
+    handler = type("BoundFakeSteamHandler", (FakeSteamHandler,), {"state": state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def add_config_args(parser: argparse.ArgumentParser) -> argparse.ArgumentParser:
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-5xx", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--online-probability", type=float, default=0.3)
+    parser.add_argument("--app-count", type=int, default=5_000)
+    parser.add_argument("--max-games", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    return parser
+
+
+def config_from_args(args: argparse.Namespace) -> FakeSteamConfig:
+    return FakeSteamConfig(
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.jitter_ms,
+        rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx,
+        retry_after=args.retry_after or None,
+        online_probability=args.online_probability,
+        app_count=args.app_count,
+        max_games_per_user=args.max_games,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    parser = add_config_args(argparse.ArgumentParser(description="Fake Steam Web API"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    server, _ = start_server(config_from_args(args), args.host, args.port)
+    logging.info(f"Fake Steam API listening on http://{args.host}:{args.port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
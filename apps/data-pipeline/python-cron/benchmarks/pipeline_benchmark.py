@@ -0,0 +1,232 @@
+"""
+End-to-end throughput benchmark for the calculate_playtime tasks.
+
+Runs the real tasks against the fake Steam server (benchmarks.fake_steam_server) and a
+local SQL container (AZURE_SQL_CONN_STRING, e.g. the azure-sql service in docker-compose).
+Seeds N synthetic users, then reports per task: wall time, users/sec, API calls,
+retries (injected 429/5xx) and rows written per table. Afterwards it checks that a refreshed
+snapshot on a not yet pruned pair doesn't produce a second delta, and exits 1 if it does.
+
+    python -m benchmarks.pipeline_benchmark --users 10000 --runs 2 --latency-ms 80 --rate-429 0.01
+
+Only point this at a disposable database, it inserts benchmark users into user_accounts.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+
+from benchmarks.fake_steam_server import add_config_args, config_from_args, start_server
+
+BENCH_STEAM_ID_BASE = 90_000_000_000_000_000
+TABLES = ["user_accounts", "steam_apps", "playtime_forever_historic", "playtime_calculated", "playtime_rollups"]
+
+# user and app only the delta check below writes to
+CHECK_STEAM_ID = BENCH_STEAM_ID_BASE - 1
+CHECK_APP_ID = 2_000_000_001
+
+
+async def seed_users(sql, count: int) -> int:
+    """Insert benchmark users that are not there yet, returns how many were added."""
+    rows = [(BENCH_STEAM_ID_BASE + i, f"bench_{i}") for i in range(count)]
+    return await sql.bulk_execute(
+        "#bench_users",
+        {"steam_id": "BIGINT NOT NULL", "name": "NVARCHAR(255) NOT NULL"},
+        rows,
+        """
+        INSERT INTO user_accounts (steam_id, name)
+        SELECT s.steam_id, s.name
+        FROM #bench_users s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM user_accounts ua WHERE ua.steam_id = s.steam_id
+        );
+        """,
+    )
+
+
+async def make_due(sql) -> int:
+    """Put every benchmark user back in the next run, otherwise the poll schedule thins out later runs."""
+    return await sql.nonquery(
+        "UPDATE user_accounts SET next_poll_at = NULL WHERE steam_id >= ?",
+        (BENCH_STEAM_ID_BASE,),
+    )
+
+
+async def count_rows(sql) -> dict[str, int]:
+    counts = {}
+    for table in TABLES:
+        res = await sql.query_one(f"SELECT COUNT_BIG(*) AS n FROM {table}")
+        counts[table] = int(res["n"])
+    return counts
+
+
+async def check_refresh_adds_no_delta() -> bool:
+    """
+    A pair with history the prune hasn't cut down yet, whose latest snapshot the next poll only refreshes,
+    must get its delta once and not again on every run.
+    """
+    import polars as pl
+    from azure.azure_sql_client import AzureSQLClient
+    from azure.playtime_writer import PlaytimeWriter
+    from pipelines.calculate_playtime.tasks.get_playtime import GetPlaytime
+
+    async with AzureSQLClient() as sql:
+        user = await sql.query_one(
+            """
+            SET NOCOUNT ON;
+            IF NOT EXISTS (SELECT 1 FROM user_accounts WHERE steam_id = ?)
+                INSERT INTO user_accounts (steam_id, name) VALUES (?, 'bench_delta_check');
+            IF NOT EXISTS (SELECT 1 FROM steam_apps WHERE app_id = ?)
+                INSERT INTO steam_apps (app_id, name) VALUES (?, 'bench_delta_check');
+            SELECT id FROM user_accounts WHERE steam_id = ?;
+            """,
+            (CHECK_STEAM_ID, CHECK_STEAM_ID, CHECK_APP_ID, CHECK_APP_ID, CHECK_STEAM_ID),
+        )
+        user_id = user["id"]
+        pair = (user_id, CHECK_APP_ID)
+
+        # two unpruned snapshots, 10 then 20 minutes played
+        await sql.nonquery(
+            """
+            DELETE FROM playtime_calculated WHERE user_id = ? AND app_id = ?;
+            DELETE FROM playtime_forever_historic WHERE user_id = ? AND app_id = ?;
+            INSERT INTO playtime_forever_historic (app_id, user_id, playtime_forever, recorded_at)
+            VALUES
+                (?, ?, 10, DATEADD(HOUR, -2, SYSDATETIME())),
+                (?, ?, 20, DATEADD(HOUR, -1, SYSDATETIME()));
+            """,
+            (*pair, *pair, CHECK_APP_ID, user_id, CHECK_APP_ID, user_id),
+        )
+        await GetPlaytime(sql).execute()
+
+        # the next poll sees the same playtime, the import only moves recorded_at of the latest row
+        await PlaytimeWriter(sql).merge_snapshot(
+            pl.DataFrame({"app_id": [CHECK_APP_ID], "user_id": [user_id], "playtime_forever": [20]})
+        )
+        await GetPlaytime(sql).execute()
+
+        res = await sql.query_one(
+            "SELECT COUNT(*) AS n FROM playtime_calculated WHERE user_id = ? AND app_id = ?",
+            pair,
+        )
+
+    if res["n"] != 1:
+        logging.error(f"Refreshed snapshot produced {res['n']} deltas for one change, expected 1")
+        return False
+    logging.info("Refreshed snapshot produced no second delta")
+    return True
+
+
+def api_stats(state) -> dict:
+    with state.lock:
+        return {
+            "api_calls": sum(state.stats.calls.values()),
+            "retries": state.stats.injected_429 + state.stats.injected_5xx,
+        }
+
+
+async def run_task(task_cls, state, users: int, **task_kwargs) -> dict:
+    from azure.azure_sql_client import AzureSQLClient
+
+    async with AzureSQLClient() as sql:
+        rows_before = await count_rows(sql)
+    api_before = api_stats(state)
+
+    start = time.perf_counter()
+    async with AzureSQLClient() as sql:
+        status = await task_cls(sql, **task_kwargs).execute()
+    elapsed = time.perf_counter() - start
+
+    api_after = api_stats(state)
+    async with AzureSQLClient() as sql:
+        rows_after = await count_rows(sql)
+
+    return {
+        "task": task_cls.__name__,
+        "status": status.name,
+        "seconds": round(elapsed, 3),
+        "users_per_sec": round(users / elapsed, 1) if elapsed else None,
+        "api_calls": api_after["api_calls"] - api_before["api_calls"],
+        "retries": api_after["retries"] - api_before["retries"],
+        "rows_written": {table: rows_after[table] - rows_before[table] for table in TABLES},
+    }
+
+
+async def main(args):
+    server, state = start_server(config_from_args(args), port=args.port)
+    os.environ["STEAM_BASE_URL"] = f"http://127.0.0.1:{args.port}"
+    os.environ["STEAM_OPENID_URL"] = f"http://127.0.0.1:{args.port}/openid/login"
+    os.environ.setdefault("STEAM_API_KEY", "benchmark")
+
+    # imported late so the tasks pick up the env above
+    from azure.azure_sql_client import AzureSQLClient
+    from steam.steam_client import SteamClient
+    from pipelines.calculate_playtime.tasks.archive_playtime import ArchivePlaytime
+    from pipelines.calculate_playtime.tasks.get_playtime import GetPlaytime
+    from pipelines.calculate_playtime.tasks.import_user_data import ImportUserData
+    from pipelines.calculate_playtime.tasks.remove_old_playtime import RemoveOldPlaytime
+    from pipelines.calculate_playtime.tasks.rollup_playtime import RollupPlaytime
+    from pipelines.utils.parquet_archive import ParquetArchive
+
+    async with AzureSQLClient() as sql:
+        added = await seed_users(sql, args.users)
+    logging.info(f"Seeded {added} benchmark users")
+
+    # RemoveOldPlaytime only prunes what ArchivePlaytime has archived, so the archive has to run too
+    archive_directory = tempfile.mkdtemp(prefix="pipeline_benchmark_archive_")
+    tasks = [
+        (ImportUserData, {}),
+        (GetPlaytime, {}),
+        (RollupPlaytime, {}),
+        (ArchivePlaytime, {"archive": ParquetArchive(archive_directory)}),
+        (RemoveOldPlaytime, {}),
+    ]
+
+    results = []
+    await SteamClient.open_shared_client()
+    try:
+        for run in range(1, args.runs + 1):
+            if not args.respect_schedule:
+                async with AzureSQLClient() as sql:
+                    await make_due(sql)
+            for task_cls, task_kwargs in tasks:
+                result = await run_task(task_cls, state, args.users, **task_kwargs)
+                result["run"] = run
+                results.append(result)
+                logging.info(json.dumps(result))
+        checks_passed = await check_refresh_adds_no_delta()
+    finally:
+        await SteamClient.close_shared_client()
+        server.shutdown()
+        logging.info(f"Archive written to {archive_directory}")
+
+    print(f"{'run':>3} {'task':<20} {'status':<8} {'seconds':>9} {'users/s':>9} {'calls':>7} {'retries':>7}  rows written")
+    for r in results:
+        rows = ", ".join(f"{table}={n}" for table, n in r["rows_written"].items() if n)
+        print(
+            f"{r['run']:>3} {r['task']:<20} {r['status']:<8} {r['seconds']:>9.3f} "
+            f"{r['users_per_sec'] or 0:>9.1f} {r['api_calls']:>7} {r['retries']:>7}  {rows or '-'}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if not checks_passed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    parser = add_config_args(argparse.ArgumentParser(description="calculate_playtime throughput benchmark"))
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--runs", type=int, default=2, help="back to back runs, deltas only show up from the second")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--respect-schedule", action="store_true", help="only poll users that are due, like cron does")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    asyncio.run(main(args))
@@ -1,20 +1,51 @@
 import logging
 import asyncio
+import os
+from datetime import datetime
+from pipelines.calculate_playtime.tasks.archive_playtime import ArchivePlaytime
 from pipelines.calculate_playtime.tasks.get_playtime import GetPlaytime
 from pipelines.calculate_playtime.tasks.import_user_data import ImportUserData
 from pipelines.calculate_playtime.tasks.remove_old_playtime import RemoveOldPlaytime
+from pipelines.calculate_playtime.tasks.rollup_playtime import RollupPlaytime
+from pipelines.calculate_playtime.sharded import run_worker
 from pipelines.utils.log_helper import configure_logger
-from pipelines.utils.task_wrapper import timed_execute
+from pipelines.utils.dag_runner import DagRunner
+from pipelines.utils.status_codes import StatusCode
+from pipelines.utils.run_metrics import emit_run_metrics
+from pipelines.utils.run_window import current_window
 from azure.azure_sql_client import AzureSQLClient
+from steam.steam_client import SteamClient
 
 async def main():
     configure_logger()
 
     logging.info("Starting Job")
-    async with AzureSQLClient() as sql:
-        await timed_execute(ImportUserData, sql)
-        await timed_execute(GetPlaytime, sql)
-        await timed_execute(RemoveOldPlaytime, sql)
+    started_at = datetime.now()
+    # PIPELINE_SHARD_COUNT > 1 turns this process into one of several competing workers
+    shard_count = int(os.getenv("PIPELINE_SHARD_COUNT", 1))
+
+    await SteamClient.open_shared_client()
+    await AzureSQLClient.open_pool()
+    results = {}
+    try:
+        if shard_count > 1:
+            await run_worker(shard_count, int(os.getenv("PIPELINE_LEASE_SECONDS", 300)))
+        else:
+            # once per process, a retry of the import that starts in the next window still belongs to this one
+            window = current_window()
+            results = await DagRunner(
+                [ImportUserData, GetPlaytime, RollupPlaytime, ArchivePlaytime, RemoveOldPlaytime],
+                task_kwargs={ImportUserData: {'window': window}},
+            ).run()
+    finally:
+        # also runs when a worker ends the process early through exit()
+        await AzureSQLClient.close_pool()
+        await SteamClient.close_shared_client()
+        emit_run_metrics('calculate_playtime', started_at)
+
+    logging.info("Task results: " + ", ".join(f"{name}={status.name}" for name, status in results.items()))
+    if StatusCode.ERROR in results.values():
+        exit(1)
     logging.info("Job Completed")
 
 if __name__ == '__main__':
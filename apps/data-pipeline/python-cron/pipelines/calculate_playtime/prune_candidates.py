@@ -0,0 +1,52 @@
+PRUNE_WATERMARK = 'remove_old_playtime'
+# recorded_at the last archive run covered, RemoveOldPlaytime never prunes past it
+ARCHIVE_WATERMARK = 'archive_playtime'
+
+# Historic rows the next prune deletes: all but the latest snapshot per user/app up to @until, limited to pairs
+# with a snapshot newer than the last completed prune (every other pair was already cut down to one row then).
+# Shared by ArchivePlaytime and RemoveOldPlaytime, both rank up to the same @until (the archive watermark),
+# so a snapshot written in between can't turn an unarchived row into a candidate.
+# Parameters are the prune watermark name and @until, callers append a statement reading from Candidates.
+PRUNE_CANDIDATES = """
+DECLARE @since DATETIME2 = COALESCE(
+    (SELECT high_water FROM pipeline_watermarks WHERE name = ?),
+    '1900-01-01'
+);
+DECLARE @until DATETIME2 = COALESCE(?, @since);
+
+WITH Touched AS (
+    SELECT DISTINCT
+        user_id,
+        app_id
+    FROM playtime_forever_historic
+    WHERE recorded_at > @since
+        AND recorded_at <= @until
+),
+RankedHistoric AS (
+    SELECT
+        h.id,
+        h.user_id,
+        h.app_id,
+        h.playtime_forever,
+        h.recorded_at,
+        ROW_NUMBER() OVER (PARTITION BY h.user_id, h.app_id ORDER BY h.recorded_at DESC) AS rn
+    FROM playtime_forever_historic h
+        INNER JOIN Touched t ON t.user_id = h.user_id AND t.app_id = h.app_id
+    WHERE h.recorded_at <= @until
+),
+Candidates AS (
+    SELECT id, user_id, app_id, playtime_forever, recorded_at
+    FROM RankedHistoric
+    WHERE rn > 1
+)
+"""
+
+SET_WATERMARK = """
+MERGE pipeline_watermarks AS target
+USING (SELECT ? AS name) AS source
+    ON target.name = source.name
+WHEN MATCHED THEN
+    UPDATE SET high_water = ?, updated_at = SYSDATETIME()
+WHEN NOT MATCHED THEN
+    INSERT (name, high_water) VALUES (source.name, ?);
+"""
@@ -1,3 +1,16 @@
 #!/bin/bash
 cd /app || exit
-/usr/bin/python3 -m pipelines.calculate_playtime.calculate_playtime --cron
+
+# A run can outlast the 15 minutes between cron starts (import timeout plus retries).
+# Two runs at once would share the checkpoint and archive directories, so a start that finds
+# the previous run still holding the lock is skipped.
+LOCK_FILE="${PIPELINE_LOCK_FILE:-/tmp/calculate_playtime.lock}"
+ALREADY_RUNNING=75
+
+/usr/bin/flock -n -E "$ALREADY_RUNNING" "$LOCK_FILE" /usr/bin/python3 -m pipelines.calculate_playtime.calculate_playtime --cron
+status=$?
+if [ "$status" -eq "$ALREADY_RUNNING" ]; then
+    echo "$(date) calculate_playtime is still running, skipping this start"
+    exit 0
+fi
+exit "$status"
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import os
+import socket
+from datetime import datetime
+from azure.azure_sql_client import AzureSQLClient
+from pipelines.calculate_playtime.tasks.archive_playtime import ArchivePlaytime
+from pipelines.calculate_playtime.tasks.get_playtime import GetPlaytime
+from pipelines.calculate_playtime.tasks.import_user_data import ImportUserData
+from pipelines.calculate_playtime.tasks.remove_old_playtime import RemoveOldPlaytime
+from pipelines.calculate_playtime.tasks.rollup_playtime import RollupPlaytime
+from pipelines.utils.run_window import current_window
+from pipelines.utils.shard_lease import FINALIZE_SHARD, ShardLeaseManager
+from pipelines.utils.dag_runner import DagRunner
+from pipelines.utils.status_codes import StatusCode
+
+JOB_NAME = 'calculate_playtime'
+
+
+async def run_worker(shard_count: int, lease_seconds: int = 300):
+    """
+    Run as one of N competing workers (processes or containers started by the same cron).
+    Each worker keeps claiming user shards for the current window and imports them, then whichever
+    worker finds every shard complete runs the set-based tasks once for everyone.
+    A worker only leaves once the whole window is complete, while another worker holds a shard it waits
+    for that lease to run out, so the shard of a crashed worker is still picked up.
+    """
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    window = current_window()
+
+    async with AzureSQLClient() as sql:
+        leases = ShardLeaseManager(sql, JOB_NAME, window, shard_count, owner, lease_seconds)
+        await leases.ensure_shards()
+
+        while True:
+            shard_id = await leases.claim()
+            if shard_id is not None:
+                await import_shard(leases, shard_id, window)
+                continue
+
+            if await leases.claim(finalize=True) is not None:
+                await finalize(leases)
+                return
+
+            wait = await leases.seconds_until_next_expiry()
+            if wait is None:
+                logging.info(f"{owner} found window {window} complete")
+                return
+            logging.info(f"{owner} waiting {wait:.0f}s for the next lease to run out")
+            await asyncio.sleep(wait + 1)
+
+
+async def import_shard(leases: ShardLeaseManager, shard_id: int, window: datetime):
+    logging.info(f"{leases.owner} importing shard {shard_id}/{leases.shard_count} for window {window}")
+    # through DagRunner so the shard gets ImportUserData's retries and timeout
+    async with leases.hold(shard_id):
+        results = await DagRunner(
+            [ImportUserData],
+            task_kwargs={ImportUserData: {'shard': (shard_id, leases.shard_count), 'window': window}},
+        ).run()
+
+    if StatusCode.ERROR in results.values():
+        await leases.release(shard_id)
+        exit(1)
+    await leases.complete(shard_id)
+
+
+async def finalize(leases: ShardLeaseManager):
+    async with leases.hold(FINALIZE_SHARD):
+        results = await DagRunner([GetPlaytime, RollupPlaytime, ArchivePlaytime, RemoveOldPlaytime]).run()
+
+    if StatusCode.ERROR in results.values():
+        await leases.release(FINALIZE_SHARD)
+        exit(1)
+    await leases.complete(FINALIZE_SHARD)
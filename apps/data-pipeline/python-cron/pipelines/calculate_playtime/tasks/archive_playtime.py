@@ -0,0 +1,121 @@
+import logging
+import asyncio
+from datetime import datetime
+import polars as pl
+from azure.azure_sql_client import AzureSQLClient
+from pipelines.classes.abstract_task import AbstractTask
+from pipelines.calculate_playtime.tasks.get_playtime import GetPlaytime
+from pipelines.calculate_playtime.prune_candidates import ARCHIVE_WATERMARK, PRUNE_CANDIDATES, PRUNE_WATERMARK, SET_WATERMARK
+from pipelines.utils.log_helper import configure_logger
+from pipelines.utils.parquet_archive import ParquetArchive
+from pipelines.utils.status_codes import StatusCode
+
+
+class ArchivePlaytime(AbstractTask):
+    """
+    Copies history out of Azure SQL into the local Parquet archive before RemoveOldPlaytime prunes it:
+    - playtime_forever_historic: every snapshot the next prune will delete (see prune_candidates)
+    - playtime_calculated: rows added since the last archived id, the table itself is left alone
+    """
+    depends_on = (GetPlaytime,)
+    retries = 1
+    timeout = 15 * 60
+
+    BATCH_SIZE = 50_000
+    HISTORIC_SCHEMA = {
+        'id': pl.Int64,
+        'user_id': pl.Int64,
+        'app_id': pl.Int64,
+        'playtime_forever': pl.Int64,
+        'recorded_at': pl.Datetime('us'),
+    }
+    CALCULATED_SCHEMA = {
+        'id': pl.Int64,
+        'user_id': pl.Int64,
+        'app_id': pl.Int64,
+        'playtime_delta': pl.Int64,
+        'recorded_at': pl.Datetime('us'),
+    }
+
+    def __init__(self, sql: AzureSQLClient, archive: ParquetArchive | None = None):
+        self.sql = sql
+        self.archive = archive or ParquetArchive()
+        self.run_id = datetime.now().strftime("%Y%m%d%H%M%S")
+
+    async def _archive_query(self, table: str, query: str, params: list, schema: dict) -> tuple[list[dict], int]:
+        """Stream a query into the archive batch by batch, returns the new manifest entries and the last id seen."""
+        entries = []
+        last_id = None
+        batch = 0
+        async for df in self.sql.query_stream(query, params, batch_size=self.BATCH_SIZE, schema=schema):
+            if df.is_empty():
+                continue
+            entries += self.archive.write_batch(table, df, self.run_id, batch)
+            last_id = max(last_id or 0, df['id'].max())
+            batch += 1
+            logging.info(f"Archived {df.height} rows of {table} (batch {batch})")
+        return entries, last_id
+
+    async def get_until(self) -> datetime | None:
+        """Newest snapshot right now, this run archives up to it and the prune after it stops there too."""
+        res = await self.sql.query_one("SELECT MAX(recorded_at) AS until FROM playtime_forever_historic")
+        return res['until'] if res else None
+
+    async def archive_historic(self, until: datetime | None) -> tuple[list[dict], int]:
+        query = f"""
+        SET NOCOUNT ON;
+        {PRUNE_CANDIDATES}
+        SELECT id, user_id, app_id, playtime_forever, recorded_at
+        FROM Candidates
+        """
+        return await self._archive_query('playtime_forever_historic', query, [PRUNE_WATERMARK, until], self.HISTORIC_SCHEMA)
+
+    async def archive_calculated(self, after_id: int) -> tuple[list[dict], int]:
+        query = """
+        SELECT id, user_id, app_id, playtime_delta, recorded_at
+        FROM playtime_calculated
+        WHERE id > ?
+        ORDER BY id
+        """
+        return await self._archive_query('playtime_calculated', query, [after_id], self.CALCULATED_SCHEMA)
+
+    def _add_to_manifest(self, manifest: dict, table: str, entries: list[dict], last_id: int | None):
+        state = manifest['tables'].setdefault(table, {'files': [], 'rows': 0, 'last_id': 0})
+        state['files'] += entries
+        state['rows'] += sum(entry['rows'] for entry in entries)
+        if last_id is not None:
+            state['last_id'] = max(state['last_id'], last_id)
+        state['updated_at'] = datetime.now().isoformat()
+
+    async def execute(self):
+        manifest = self.archive.load_manifest()
+        calculated_after = manifest['tables'].get('playtime_calculated', {}).get('last_id', 0)
+
+        until = await self.get_until()
+        historic_entries, historic_last_id = await self.archive_historic(until)
+        calculated_entries, calculated_last_id = await self.archive_calculated(calculated_after)
+
+        # files only become part of the archive once the manifest points at them
+        self._add_to_manifest(manifest, 'playtime_forever_historic', historic_entries, historic_last_id)
+        self._add_to_manifest(manifest, 'playtime_calculated', calculated_entries, calculated_last_id)
+        self.archive.save_manifest(manifest)
+        # only once the files are in the manifest may RemoveOldPlaytime delete the rows up to here
+        if until is not None:
+            await self.sql.nonquery(SET_WATERMARK, (ARCHIVE_WATERMARK, until, until))
+
+        logging.info(
+            f"Archive run {self.run_id}: {len(historic_entries)} historic files, "
+            f"{len(calculated_entries)} calculated files"
+        )
+        # an empty archive run is still a success, pruning must not be skipped because of it
+        return StatusCode.SUCCESS
+
+
+if __name__ == "__main__":
+    configure_logger()
+
+    async def main():
+        async with AzureSQLClient() as sql:
+            await ArchivePlaytime(sql).execute()
+
+    asyncio.run(main())
@@ -5,12 +5,126 @@ from steam.steam_client import SteamClient
 from pipelines.utils.log_helper import configure_logger
 from pipelines.utils.status_codes import StatusCode
 from pipelines.classes.abstract_task import AbstractTask
+from pipelines.calculate_playtime.tasks.import_user_data import ImportUserData
 
 
 class GetPlaytime(AbstractTask):
-    def __init__(self, sql: AzureSQLClient):
+    depends_on = (ImportUserData,)
+    retries = 2
+    timeout = 10 * 60
+
+    WATERMARK = 'get_playtime'
+
+    def __init__(self, sql: AzureSQLClient, incremental: bool = True):
         self.sql = sql
         self.steamClient = SteamClient()
+        self.incremental = incremental
+
+    async def get_insert_playtime_data_incremental(self) -> int:
+        """
+        Only compute deltas for user/app pairs whose latest snapshot was inserted since the last run.
+        Progress is tracked by id, not recorded_at: the import refreshes recorded_at of an unchanged snapshot,
+        and a pair the prune hasn't cut down yet would otherwise get the same delta again on every poll.
+        The insert and the new watermark commit together, so a failed run is simply redone next time.
+        """
+        query = """
+        SET NOCOUNT ON;
+        SET XACT_ABORT ON;
+        BEGIN TRANSACTION;
+
+        DECLARE @since DATETIME2 = COALESCE(
+            (SELECT high_water FROM pipeline_watermarks WITH (UPDLOCK, HOLDLOCK) WHERE name = ?),
+            '1900-01-01'
+        );
+        DECLARE @until DATETIME2 = COALESCE(
+            (SELECT MAX(recorded_at) FROM playtime_forever_historic),
+            @since
+        );
+        DECLARE @since_id INT = COALESCE(
+            (SELECT high_water_id FROM pipeline_watermarks WHERE name = ?),
+            -- watermark written before ids were tracked, anything recorded up to it was inserted before it
+            (SELECT MAX(id) FROM playtime_forever_historic WHERE recorded_at <= @since),
+            0
+        );
+        DECLARE @until_id INT = COALESCE(
+            (SELECT MAX(id) FROM playtime_forever_historic),
+            @since_id
+        );
+
+        WITH Touched AS (
+            SELECT DISTINCT
+                user_id,
+                app_id
+            FROM playtime_forever_historic
+            WHERE id > @since_id
+                AND id <= @until_id
+        ),
+        RankedPlaytime AS (
+            SELECT
+                h.id,
+                h.app_id,
+                h.playtime_forever,
+                h.recorded_at,
+                h.user_id,
+                ROW_NUMBER() OVER (PARTITION BY h.user_id, h.app_id ORDER BY h.recorded_at DESC) AS rn
+            FROM playtime_forever_historic h
+                     INNER JOIN Touched t ON t.user_id = h.user_id AND t.app_id = h.app_id
+                     INNER JOIN dbo.user_accounts ua ON ua.id = h.user_id
+            WHERE ua.is_active = 1
+                AND h.id <= @until_id
+        ),
+        Today AS (
+            SELECT *
+            FROM RankedPlaytime
+            WHERE rn = 1
+                AND id > @since_id
+        ),
+        Last AS (
+            SELECT *
+            FROM RankedPlaytime
+            WHERE rn = 2
+        ),
+        PlaytimeDelta AS (
+            SELECT
+                t.app_id,
+                t.user_id,
+                t.playtime_forever - l.playtime_forever AS playtime_delta,
+                GETDATE() AS recorded_at
+            FROM Today t
+            INNER JOIN Last l
+                ON t.app_id = l.app_id
+                AND t.user_id = l.user_id
+            WHERE t.playtime_forever - l.playtime_forever <> 0
+        )
+        INSERT INTO playtime_calculated (
+            app_id,
+            user_id,
+            playtime_delta,
+            recorded_at
+        )
+        SELECT
+            app_id,
+            user_id,
+            playtime_delta,
+            recorded_at
+        FROM PlaytimeDelta;
+
+        DECLARE @inserted INT = @@ROWCOUNT;
+
+        MERGE pipeline_watermarks AS target
+        USING (SELECT ? AS name) AS source
+            ON target.name = source.name
+        WHEN MATCHED THEN
+            UPDATE SET high_water = @until, high_water_id = @until_id, updated_at = SYSDATETIME()
+        WHEN NOT MATCHED THEN
+            INSERT (name, high_water, high_water_id) VALUES (source.name, @until, @until_id);
+
+        COMMIT TRANSACTION;
+
+        SELECT @inserted AS inserted;
+        """
+        res = await self.sql.query_one(query, (self.WATERMARK, self.WATERMARK, self.WATERMARK))
+        return res['inserted'] if res else 0
 
     async def get_insert_playtime_data(self) -> int:
         # Use CAST(recorded_at AS DATE) to only consider the local day
@@ -64,8 +178,10 @@ class GetPlaytime(AbstractTask):
         return await self.sql.nonquery(query)
 
     async def execute(self):
-        inserts = await self.get_insert_playtime_data()
-        await self.sql.close()
+        if self.incremental:
+            inserts = await self.get_insert_playtime_data_incremental()
+        else:
+            inserts = await self.get_insert_playtime_data()
         logging.info(f"Inserted {inserts} daily playtime records successfully.")
 
         return StatusCode.SUCCESS
@@ -1,134 +1,151 @@
 import logging
 from datetime import datetime
 from azure.azure_sql_client import AzureSQLClient
+from azure.playtime_writer import PlaytimeWriter
 import polars as pl
 from steam.steam_client import SteamClient
 from pipelines.classes.abstract_task import AbstractTask
 from pipelines.utils.log_helper import configure_logger
 from pipelines.utils.status_codes import StatusCode
+from pipelines.utils.checkpoint import RunCheckpoint
+from pipelines.utils.run_window import current_window
+from pipelines.utils.poll_schedule import PollSchedule
+from telemetry.metrics import metrics
 import asyncio
 
 
 class ImportUserData(AbstractTask):
-    def __init__(self, sql: AzureSQLClient):
+    # retries resume from the run checkpoint instead of refetching everyone
+    retries = 2
+    retry_backoff = 60
+    timeout = 45 * 60
+
+    USER_SCHEMA = {
+        'id': pl.Int64,
+        'steam_id': pl.Int64,
+        'last_log_off': pl.Datetime('us'),
+        'poll_interval_minutes': pl.Int64,
+    }
+
+    # users fetched between checkpoints
+    CHECKPOINT_CHUNK = 500
+
+    _known_app_ids: set[int] | None = None
+
+    def __init__(
+        self,
+        sql: AzureSQLClient,
+        check_activity: bool = True,
+        shard: tuple[int, int] | None = None,
+        window: datetime | None = None,
+    ):
+        """
+        shard is (shard_id, shard_count), only users with id % shard_count == shard_id are imported.
+        window is the run window of the process, retries get the same one even when they start in the next window.
+        """
         self.sql = sql
+        self.writer = PlaytimeWriter(sql)
         self.steamClient = SteamClient()
-
-    async def get_users(self):
-        """Fetch active users for the specified timezone."""
-        users = await self.sql.query("""
+        self.check_activity = check_activity
+        self.shard = shard
+        self.schedule = PollSchedule()
+
+        self.window = window or current_window()
+        window = f"{self.window:%Y%m%d%H%M}"
+        shard_name = "" if shard is None else f"shard{shard[0]}of{shard[1]}"
+        RunCheckpoint.remove_stale(keep_prefix=window)
+        # a failed attempt of an earlier window goes first, its users are no longer due
+        self.checkpoint = RunCheckpoint.unfinished(shard_name) or RunCheckpoint("-".join(filter(None, (window, shard_name))))
+
+    async def get_users(self) -> pl.DataFrame:
+        """Fetch active users that are due for a poll, see PollSchedule."""
+        query = """
             SELECT 
                 id,
                 steam_id,
-                last_log_off
+                last_log_off,
+                poll_interval_minutes
             FROM user_accounts
             WHERE is_active = 1
-        """)
+                AND (next_poll_at IS NULL OR next_poll_at <= SYSUTCDATETIME())
+        """
+        params = ()
+        if self.shard is not None:
+            shard_id, shard_count = self.shard
+            query += " AND id % ? = ?"
+            params = (shard_count, shard_id)
+
+        users = await self.sql.query_frame(query, params, schema=self.USER_SCHEMA)
         return users
 
-    async def check_user_activity(self, users: list[dict]):
+    async def check_user_activity(self, users: pl.DataFrame) -> pl.DataFrame:
         """
         Check that users have playtime since last logged
         do this because we can batch this by up to 100 people,
-        saving up to 99 calls sometimes
+        saving up to 99 calls sometimes.
+        Returns the users that were online since the last run.
         """
         # last log off is a misleading name
         # per steam docs:
         # The last time the user was online, in unix time.
+        # decoded straight into a typed frame, 100 ids per steam call
+        summaries = await self.steamClient.get_player_activity_frame(users['steam_id'].to_list())
+
+        df = (
+            users
+            .rename({'last_log_off': 'db_last_log_off'})
+            .join(
+                summaries.select(
+                    pl.col('steamid').cast(pl.Int64).alias('steam_id'),
+                    (pl.col('profilestate').fill_null(0) == 1).alias('is_active'),
+                    (pl.col('personastate').fill_null(0) != 0).alias('is_online'),
+                    pl.from_epoch('lastlogoff', time_unit='s').cast(pl.Datetime('us')).alias('last_log_off'),
+                ),
+                on='steam_id',
+                how='inner',
+            )
+            .with_columns(
+                (
+                    pl.col('db_last_log_off').is_null() & pl.col('last_log_off').is_not_null()
+                    | (pl.col('last_log_off') != pl.col('db_last_log_off'))
+                ).fill_null(False).alias('last_log_off_changed')
+            )
+        )
 
-        calls = []
-        for i in range(0, len(users), 100):
-            batch = users[i:i+100]
-            calls.append(self.steamClient.get_steam_users_raw([user['steam_id'] for user in batch]))
-
-        results = await asyncio.gather(*calls)
-        flattended = []
-        for batch in results:
-            flattended.extend(batch)
-        df = pl.DataFrame(flattended)
-
-        steam_to_user = {user['steam_id']: user['id'] for user in users}
-
-        df = df.with_columns([
-            pl.Series('id', [steam_to_user.get(str(sid)) for sid in df['steamid']]),
-            (pl.col('profilestate') == 1).cast(pl.Int8).alias('is_active'),
-            pl.from_epoch("lastlogoff", time_unit="s").alias("last_log_off")
-        ])
-
-        df = df.with_columns([
-            pl.col('steamid').alias('steam_id')
-        ])
-
-        disable_accounts = [str(account['id']) for account in df.to_dicts() if not account['is_active']]
-        if len(disable_accounts) != 0:
-            query = f"""
-            UPDATE user_accounts
-            SET is_active = 0
-            WHERE
-                id IN ({','.join(disable_accounts)})
-            """
-
-            await self.sql.nonquery(query)
-
-        logging.info(users)
+        # one bulk update for both disabled accounts and new log off times
+        updates = df.filter(pl.col('last_log_off_changed') | ~pl.col('is_active'))
+        if not updates.is_empty():
+            await self.sql.bulk_execute(
+                '#activity_staging',
+                {'id': 'INT NOT NULL', 'last_log_off': 'DATETIME2 NULL', 'is_active': 'BIT NOT NULL'},
+                updates.select('id', 'last_log_off', 'is_active').rows(),
+                """
+                UPDATE ua
+                SET
+                    ua.last_log_off = COALESCE(s.last_log_off, ua.last_log_off),
+                    ua.is_active = s.is_active
+                FROM user_accounts ua
+                INNER JOIN #activity_staging s ON s.id = ua.id
+                """,
+            )
 
-        db_last_log_off = {user['id']: user['last_log_off'] for user in users}
+        disabled = df.filter(~pl.col('is_active')).height
+        if disabled:
+            logging.info(f"Disabled {disabled} accounts without a configured steam profile")
 
-        df = df.with_columns(
-            pl.col("id")
-            .map_elements(lambda x: db_last_log_off.get(x))
-            .alias("db_last_log_off")
+        # lastlogoff does not move while someone stays in game, so anyone online counts as active too
+        return (
+            df
+            .filter(pl.col('is_active') & (pl.col('last_log_off_changed') | pl.col('is_online')))
+            .select('id', 'steam_id', 'last_log_off')
         )
 
-        df = df.with_columns(
-            (pl.col("last_log_off") != pl.col("db_last_log_off"))
-            .fill_null(False)
-            .alias("last_log_off_changed")
-        )
+    async def insert_rows(self, games: pl.DataFrame):
+        """Stage all game rows in batches, then merge them into playtime_historic in one statement."""
+        logging.info(f"Inserting {games.height} rows into playtime_historic in a single batch")
+        await self.writer.merge_snapshot(games)
 
-        changed_users = df.filter(pl.col('last_log_off_changed')).to_dicts()
-
-        # Update DB: last_log_off and is_active
-        for user in changed_users:
-            await self.sql.nonquery("""
-                UPDATE user_accounts
-                SET last_log_off = ?
-                WHERE id = ?
-            """, (user['last_log_off'], user['id']))
-
-        return changed_users
-
-    async def insert_rows(self, all_games):
-        """Insert all game rows into SQL in a single batch."""
-        combined_games = pl.concat(all_games)
-        time = datetime.now()
-        values = [
-            (
-                int(row['app_id']),
-                int(row['user_id']),
-                int(row['playtime_forever']),
-                time
-            )
-            for row in combined_games.iter_rows(named=True)
-        ]
-
-        logging.info(f"Inserting {len(values)} rows into playtime_historic in a single batch")
-        query = """
-            MERGE dbo.playtime_forever_historic AS target
-            USING (VALUES (?, ?, ?, ?)) AS source (app_id, user_id, playtime_forever, recorded_at)
-                ON target.app_id = source.app_id
-                   AND target.user_id = source.user_id
-                   AND target.playtime_forever = source.playtime_forever
-            WHEN MATCHED THEN
-                UPDATE SET recorded_at = source.recorded_at
-            WHEN NOT MATCHED THEN
-                INSERT (app_id, user_id, playtime_forever, recorded_at)
-                VALUES (source.app_id, source.user_id, source.playtime_forever, source.recorded_at);
-        """
-        await self.sql.nonquery(query, values)
-
-    async def fetch_all_users_games(self, users) -> pl.DataFrame:
-        logging.info(users)
+    async def fetch_all_users_games(self, users: pl.DataFrame) -> pl.DataFrame:
         """Fetch recently played games for all users in parallel."""
         async def fetch_user_games(row):
             steam_id = row['steam_id']
@@ -140,64 +157,108 @@ class ImportUserData(AbstractTask):
                 pl.lit(row['id']).alias('user_id')
             ).drop('playtime_2weeks')
 
-        user_games_list = await asyncio.gather(*(fetch_user_games(u) for u in users))
-        return pl.concat(user_games_list)
+        # fetch in chunks so a failure only loses the chunk in progress
+        fetched = []
+        for chunk in users.select('id', 'steam_id').iter_slices(self.CHECKPOINT_CHUNK):
+            user_games_list = await asyncio.gather(
+                *(fetch_user_games(u) for u in chunk.iter_rows(named=True))
+            )
+            user_games_list = [games for games in user_games_list if games is not None]
+            chunk_games = pl.concat(user_games_list, how="vertical_relaxed") if user_games_list else pl.DataFrame()
+            self.checkpoint.save_progress(chunk_games, chunk['id'].to_list())
+            metrics.counter("pipeline_users_fetched_total", "Users whose games were fetched").inc(chunk.height)
+            fetched.append(chunk_games)
+
+        fetched = [games for games in fetched if not games.is_empty()]
+        if not fetched:
+            return pl.DataFrame()
+        return pl.concat(fetched, how="vertical_relaxed")
+
+    async def get_known_app_ids(self) -> set[int]:
+        """App ids already in steam_apps, loaded once per process and kept up to date by insert_apps."""
+        if ImportUserData._known_app_ids is None:
+            apps = await self.sql.query_frame(
+                "SELECT app_id FROM dbo.steam_apps",
+                schema={'app_id': pl.Int64},
+            )
+            ImportUserData._known_app_ids = set(apps['app_id'].to_list())
+        return ImportUserData._known_app_ids
 
-    async def insert_apps(self, user_data: pl.DataFrame) -> None:
+    async def insert_apps(self, user_data: pl.DataFrame) -> int:
         """
-        insert the game ids
+        insert the game ids we have not seen before
         """
-        # want to select distinct app ids
-        df = user_data.unique(subset='app_id')
-        df = df.with_columns(
-            pl.struct(['app_id', 'img_icon_url'])
-                .map_elements(lambda s: SteamClient.map_img_icon_hash_to_url(s['app_id'], s['img_icon_url']))
-                .alias('img_url')
-        )
-
-        values = [
-            (
-                int(row['app_id']),
-                row['name'],
-                row['img_url'],
-                int(row['app_id'])
+        known = await self.get_known_app_ids()
+        new_apps = (
+            user_data
+            .unique(subset='app_id')
+            .filter(~pl.col('app_id').is_in(pl.Series(list(known), dtype=pl.Int64)))
+            .select(
+                pl.col('app_id').cast(pl.Int64),
+                pl.col('name').fill_null(''),
+                SteamClient.img_icon_url_expr().alias('img_url'),
             )
-            for row in df.iter_rows(named=True)
-        ]
-
-        query = """
-        SELECT ?, ?, ?
-        WHERE NOT EXISTS (
-            SELECT 1 FROM dbo.steam_apps WHERE app_id = ?
-        );
-        """
+        )
 
-        missing = await self.sql.query(query, values)
+        if new_apps.is_empty():
+            return 0
+
+        inserted = await self.writer.insert_apps(new_apps)
+        known.update(new_apps['app_id'].to_list())
+        logging.info(f"Inserted {inserted} new apps into steam_apps")
+        return inserted
+
+    async def get_pending_users(self) -> pl.DataFrame:
+        """Users to fetch this run, taken from the checkpoint when a previous attempt in this window failed."""
+        users = self.checkpoint.load_pending()
+        if users is not None:
+            logging.info(f"Resuming run {self.checkpoint.run_id} with {users.height} pending users")
+            return users
+
+        due = await self.get_users()
+        if due.is_empty():
+            logging.info("No users due for a poll")
+            return due
+        logging.info(f"{due.height} users due for a poll")
+
+        users = due
+        if self.check_activity:
+            # this updates last_log_off, so it has to be remembered for a retry
+            users = await self.check_user_activity(due)
+
+        if not users.is_empty():
+            self.checkpoint.save_pending(users)
+        # after the checkpoint, a retry resumes from it and no longer needs these users to be due
+        await self.schedule.save(self.sql, self.schedule.next_intervals(due, users['id'].to_list()), self.window)
+
+        if users.is_empty():
+            logging.info("No user activity")
+        return users
 
     async def execute(self):
-        users = await self.get_users()
-
-        if len(users) == 0:
-            logging.info("No users found")
+        users = await self.get_pending_users()
+        if users.is_empty():
             return StatusCode.NO_DATA
 
-        # changed_users = await self.check_user_activity(users)
-
-        # if len(changed_users) == 0:
-        #     logging.info("No user activity")
-        #     return StatusCode.NO_DATA
+        done_games, done_ids = self.checkpoint.load_progress()
+        if done_ids:
+            logging.info(f"Skipping {len(done_ids)} users already fetched in this window")
+            users = users.filter(~pl.col('id').is_in(pl.Series(list(done_ids), dtype=pl.Int64)))
 
         games = await self.fetch_all_users_games(users)
-        if not games:
+        fetched = [df for df in (done_games, games) if not df.is_empty()]
+        games = pl.concat(fetched, how="vertical_relaxed") if fetched else pl.DataFrame()
+        if games.is_empty():
             logging.info("No games to insert")
+            self.checkpoint.clear()
             return StatusCode.NO_DATA
 
         await self.insert_apps(games)
         await self.insert_rows(games)
+        self.checkpoint.clear()
         return StatusCode.SUCCESS
 
 
-
 if __name__ == "__main__":
     configure_logger()
     with AzureSQLClient() as sql:
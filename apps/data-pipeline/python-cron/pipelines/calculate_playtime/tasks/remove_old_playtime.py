@@ -1,14 +1,116 @@
 import logging
 import asyncio
+import os
+import time
 from azure.azure_sql_client import AzureSQLClient
 from pipelines.classes.abstract_task import AbstractTask
+from pipelines.calculate_playtime.tasks.get_playtime import GetPlaytime
+from pipelines.calculate_playtime.tasks.archive_playtime import ArchivePlaytime
+from pipelines.calculate_playtime.prune_candidates import ARCHIVE_WATERMARK, PRUNE_CANDIDATES, PRUNE_WATERMARK, SET_WATERMARK
 from pipelines.utils.log_helper import configure_logger
 from pipelines.utils.status_codes import StatusCode
+from telemetry.metrics import metrics
 
 
 class RemoveOldPlaytime(AbstractTask):
-    def __init__(self, sql: AzureSQLClient):
+    # deltas have to be computed, and the snapshots archived, before they are removed
+    depends_on = (GetPlaytime, ArchivePlaytime)
+    retries = 1
+    timeout = 10 * 60
+
+    BATCH_SIZE = int(os.getenv("PIPELINE_PRUNE_BATCH_SIZE", 5000))
+    # stop starting new batches after this many seconds, whatever is left is picked up next run
+    TIME_BUDGET = float(os.getenv("PIPELINE_PRUNE_TIME_BUDGET", 300))
+
+    def __init__(self, sql: AzureSQLClient, batched: bool = True, batch_size: int | None = None, time_budget: float | None = None):
         self.sql = sql
+        self.batched = batched
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self.time_budget = time_budget if time_budget is not None else self.TIME_BUDGET
+
+    async def collect_candidates(self) -> tuple[object, int]:
+        """
+        Materialize the ids to delete into #prune_ids once, so every batch is a cheap seek instead of re-ranking history.
+        Candidates stop at what ArchivePlaytime last archived, nothing newer is deleted before it has been archived.
+        Returns the high-water mark the candidates were computed up to and how many there are.
+        """
+        archived = await self.sql.query_one(
+            "SELECT high_water FROM pipeline_watermarks WHERE name = ?",
+            (ARCHIVE_WATERMARK,),
+        )
+        until = archived['high_water'] if archived else None
+
+        # created without parameters like bulk_load does, a parameterized batch runs through sp_executesql
+        # and a temp table created in there is gone when it returns. Pooled connections are reused,
+        # so a previous attempt may have left the table behind.
+        await self.sql.nonquery("DROP TABLE IF EXISTS #prune_ids; CREATE TABLE #prune_ids (id INT PRIMARY KEY);")
+
+        query = f"""
+        SET NOCOUNT ON;
+        {PRUNE_CANDIDATES}
+        INSERT INTO #prune_ids (id)
+        SELECT id FROM Candidates;
+
+        SELECT @until AS until, (SELECT COUNT(*) FROM #prune_ids) AS candidates;
+        """
+        res = await self.sql.query_one(query, (PRUNE_WATERMARK, until))
+        return res['until'], res['candidates']
+
+    async def delete_batch(self) -> int:
+        """Delete the next batch of candidates in its own short transaction, returns how many ids it took."""
+        query = """
+        SET NOCOUNT ON;
+        SET XACT_ABORT ON;
+        DECLARE @batch TABLE (id INT PRIMARY KEY);
+
+        BEGIN TRANSACTION;
+
+        DELETE TOP (?) FROM #prune_ids
+        OUTPUT DELETED.id INTO @batch;
+
+        DECLARE @taken INT = @@ROWCOUNT;
+
+        DELETE h
+        FROM playtime_forever_historic h
+            INNER JOIN @batch b ON b.id = h.id;
+
+        COMMIT TRANSACTION;
+
+        SELECT @taken AS taken;
+        """
+        res = await self.sql.query_one(query, (self.batch_size,))
+        return res['taken'] if res else 0
+
+    async def advance_watermark(self, until):
+        await self.sql.nonquery(SET_WATERMARK, (PRUNE_WATERMARK, until, until))
+
+    async def remove_old_records_batched(self) -> bool:
+        """
+        Deletes the same rows as remove_old_records, but only for pairs touched since the last completed prune
+        and in small batches, so locks stay at row level and the log never holds one huge transaction.
+        Returns False when the time budget ran out before everything was deleted.
+        """
+        start_time = time.perf_counter()
+        until, total = await self.collect_candidates()
+        logging.info(f"{total} historic rows to prune (batches of {self.batch_size}, budget {self.time_budget:.0f}s)")
+
+        deleted = 0
+        while deleted < total:
+            elapsed = time.perf_counter() - start_time
+            if elapsed >= self.time_budget:
+                logging.warning(f"Prune time budget used up after {elapsed:.1f}s, {total - deleted} rows left for the next run")
+                return False
+
+            taken = await self.delete_batch()
+            if taken == 0:
+                break
+            deleted += taken
+            metrics.counter("pipeline_rows_pruned_total", "Historic playtime rows deleted by RemoveOldPlaytime").inc(taken)
+            logging.info(f"Pruned {deleted}/{total} rows ({deleted / total:.0%}) in {time.perf_counter() - start_time:.1f}s")
+
+        # only a complete prune may move the watermark, otherwise the leftovers would never be looked at again
+        await self.advance_watermark(until)
+        return True
 
     async def remove_old_records(self):
         """
@@ -37,7 +139,11 @@ class RemoveOldPlaytime(AbstractTask):
 
     async def execute(self):
         logging.info("Starting cleanup of historic playtime data...")
-        await self.remove_old_records()
+        if not self.batched:
+            await self.remove_old_records()
+        elif not await self.remove_old_records_batched():
+            logging.info("Historic data cleanup partially complete.")
+            return StatusCode.SUCCESS
         logging.info("Historic data cleanup complete.")
 
         return StatusCode.SUCCESS
@@ -0,0 +1,108 @@
+import logging
+import asyncio
+from azure.azure_sql_client import AzureSQLClient
+from pipelines.classes.abstract_task import AbstractTask
+from pipelines.calculate_playtime.tasks.get_playtime import GetPlaytime
+from pipelines.utils.log_helper import configure_logger
+from pipelines.utils.status_codes import StatusCode
+
+
+class RollupPlaytime(AbstractTask):
+    depends_on = (GetPlaytime,)
+    retries = 2
+    timeout = 10 * 60
+
+    WATERMARK = 'rollup_playtime'
+
+    def __init__(self, sql: AzureSQLClient):
+        self.sql = sql
+
+    async def merge_new_deltas(self) -> int:
+        """
+        Adds the playtime_calculated rows written since the last rollup onto the day, week and month totals.
+        Rollup and watermark commit together, so a failed run is redone as a whole and nothing is counted twice.
+        """
+        # 1900-01-01 was a Monday, so counting days from it modulo 7 gives the offset into the week
+        query = """
+        SET NOCOUNT ON;
+        SET XACT_ABORT ON;
+        BEGIN TRANSACTION;
+
+        DECLARE @since DATETIME2 = COALESCE(
+            (SELECT high_water FROM pipeline_watermarks WITH (UPDLOCK, HOLDLOCK) WHERE name = ?),
+            '1900-01-01'
+        );
+        DECLARE @until DATETIME2 = COALESCE(
+            (SELECT MAX(recorded_at) FROM playtime_calculated),
+            @since
+        );
+
+        WITH NewDeltas AS (
+            SELECT
+                user_id,
+                app_id,
+                playtime_delta,
+                CAST(recorded_at AS DATE) AS day
+            FROM playtime_calculated
+            WHERE recorded_at > @since
+                AND recorded_at <= @until
+        ),
+        Periods AS (
+            SELECT
+                p.granularity,
+                p.period_start,
+                d.user_id,
+                d.app_id,
+                SUM(CAST(d.playtime_delta AS BIGINT)) AS playtime_minutes
+            FROM NewDeltas d
+            CROSS APPLY (VALUES
+                ('day', d.day),
+                ('week', DATEADD(DAY, -(DATEDIFF(DAY, '1900-01-01', d.day) % 7), d.day)),
+                ('month', DATEFROMPARTS(YEAR(d.day), MONTH(d.day), 1))
+            ) AS p (granularity, period_start)
+            GROUP BY p.granularity, p.period_start, d.user_id, d.app_id
+        )
+        MERGE playtime_rollups WITH (HOLDLOCK) AS target
+        USING Periods AS source
+            ON target.user_id = source.user_id
+            AND target.granularity = source.granularity
+            AND target.period_start = source.period_start
+            AND target.app_id = source.app_id
+        WHEN MATCHED THEN
+            UPDATE SET playtime_minutes = target.playtime_minutes + source.playtime_minutes
+        WHEN NOT MATCHED THEN
+            INSERT (user_id, granularity, period_start, app_id, playtime_minutes)
+            VALUES (source.user_id, source.granularity, source.period_start, source.app_id, source.playtime_minutes);
+
+        DECLARE @merged INT = @@ROWCOUNT;
+
+        MERGE pipeline_watermarks AS target
+        USING (SELECT ? AS name) AS source
+            ON target.name = source.name
+        WHEN MATCHED THEN
+            UPDATE SET high_water = @until, updated_at = SYSDATETIME()
+        WHEN NOT MATCHED THEN
+            INSERT (name, high_water) VALUES (source.name, @until);
+
+        COMMIT TRANSACTION;
+
+        SELECT @merged AS merged;
+        """
+        res = await self.sql.query_one(query, (self.WATERMARK, self.WATERMARK))
+        return res['merged'] if res else 0
+
+    async def execute(self):
+        merged = await self.merge_new_deltas()
+        logging.info(f"Updated {merged} playtime rollup rows.")
+
+        return StatusCode.SUCCESS
+
+
+if __name__ == "__main__":
+    configure_logger()
+
+    async def main():
+        async with AzureSQLClient() as sql:
+            await RollupPlaytime(sql).execute()
+
+    asyncio.run(main())
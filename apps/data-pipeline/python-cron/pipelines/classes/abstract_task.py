@@ -7,8 +7,18 @@ class AbstractTask(ABC):
     """
     Base class for all tasks.
     Subclasses must implement the `execute()` method which returns a StatusCode.
+
+    When run through the DagRunner, subclasses can also declare:
+    - depends_on: tasks that have to finish with SUCCESS first, otherwise this one is skipped
+    - retries / retry_backoff: how many extra attempts an ERROR gets, and seconds between them
+    - timeout: seconds an attempt may take before it counts as an ERROR
     """
 
+    depends_on: tuple[type['AbstractTask'], ...] = ()
+    retries: int = 0
+    retry_backoff: float = 5.0
+    timeout: float | None = None
+
     @abstractmethod
     async def execute(self) -> StatusCode:
         """Execute the task and return a StatusCode result."""
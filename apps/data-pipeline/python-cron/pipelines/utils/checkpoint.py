@@ -0,0 +1,110 @@
+import logging
+import os
+import shutil
+import time
+import polars as pl
+
+CHECKPOINT_DIRECTORY = os.getenv("PIPELINE_CHECKPOINT_DIRECTORY", "/app/checkpoints/")
+# past the longest poll interval every user in an abandoned checkpoint is due again anyway
+CHECKPOINT_MAX_AGE = int(os.getenv("PIPELINE_CHECKPOINT_MAX_AGE_HOURS", 24)) * 3600
+
+
+class RunCheckpoint:
+    """
+    Local spill files for one run, so a retried run can pick up where the failed one stopped.
+
+    run_id is <window>[-<shard>], e.g. 202401011200 or 202401011200-shard0of4.
+
+    Layout under CHECKPOINT_DIRECTORY/<run_id>/:
+        pending.parquet      users this run has to fetch
+        games-00000.parquet  fetched rows, one file per completed chunk
+        done-00000.parquet   user ids finished by that chunk (including users without games)
+    """
+
+    def __init__(self, run_id: str, directory: str = CHECKPOINT_DIRECTORY):
+        self.run_id = run_id
+        self.directory = directory
+        self.path = os.path.join(directory, run_id)
+
+    def _write(self, df: pl.DataFrame, name: str):
+        # write then rename, a crash mid-write never leaves a half file behind
+        os.makedirs(self.path, exist_ok=True)
+        tmp = os.path.join(self.path, f".{name}.tmp")
+        df.write_parquet(tmp)
+        os.replace(tmp, os.path.join(self.path, name))
+
+    def _parts(self, prefix: str) -> list[str]:
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(
+            os.path.join(self.path, name)
+            for name in os.listdir(self.path)
+            if name.startswith(prefix) and name.endswith(".parquet")
+        )
+
+    def has_pending(self) -> bool:
+        return os.path.exists(os.path.join(self.path, "pending.parquet"))
+
+    def age(self) -> float:
+        return time.time() - os.path.getmtime(self.path)
+
+    @classmethod
+    def _existing(cls, directory: str) -> list["RunCheckpoint"]:
+        if not os.path.isdir(directory):
+            return []
+        return [cls(name, directory) for name in sorted(os.listdir(directory))]
+
+    @classmethod
+    def remove_stale(cls, keep_prefix: str, directory: str = CHECKPOINT_DIRECTORY, max_age: int = CHECKPOINT_MAX_AGE):
+        """
+        Drop checkpoints of other windows that have nothing left to resume.
+        One that still has pending users belongs to a failed run and is kept for unfinished(), up to max_age.
+        """
+        for checkpoint in cls._existing(directory):
+            if checkpoint.run_id.startswith(keep_prefix):
+                continue
+            if checkpoint.has_pending() and checkpoint.age() < max_age:
+                continue
+            logging.info(f"Removing stale checkpoint {checkpoint.run_id}")
+            shutil.rmtree(checkpoint.path, ignore_errors=True)
+
+    @classmethod
+    def unfinished(cls, shard: str = "", directory: str = CHECKPOINT_DIRECTORY) -> "RunCheckpoint | None":
+        """
+        Oldest checkpoint of an earlier window for the same shard that still has pending users.
+        Its users were already rescheduled when it was written, nothing else would ever fetch them.
+        """
+        for checkpoint in cls._existing(directory):
+            if checkpoint.run_id.partition("-")[2] == shard and checkpoint.has_pending():
+                return checkpoint
+        return None
+
+    def save_pending(self, users: pl.DataFrame):
+        self._write(users, "pending.parquet")
+
+    def load_pending(self) -> pl.DataFrame | None:
+        path = os.path.join(self.path, "pending.parquet")
+        return pl.read_parquet(path) if os.path.exists(path) else None
+
+    def save_progress(self, games: pl.DataFrame, done_user_ids: list[int]):
+        part = len(self._parts("done-"))
+        if not games.is_empty():
+            self._write(games, f"games-{part:05d}.parquet")
+        # done last, a chunk only counts once both files are there
+        self._write(pl.DataFrame({"id": done_user_ids}, schema={"id": pl.Int64}), f"done-{part:05d}.parquet")
+
+    def load_progress(self) -> tuple[pl.DataFrame, set[int]]:
+        """Rows fetched so far and the ids of the users they cover."""
+        done_files = self._parts("done-")
+        done = set()
+        for path in done_files:
+            done.update(pl.read_parquet(path)["id"].to_list())
+
+        # ignore games files whose done file never made it to disk
+        done_parts = {os.path.basename(path)[len("done-"):] for path in done_files}
+        game_files = [path for path in self._parts("games-") if os.path.basename(path)[len("games-"):] in done_parts]
+        games = pl.concat([pl.read_parquet(path) for path in game_files], how="vertical_relaxed") if game_files else pl.DataFrame()
+        return games, done
+
+    def clear(self):
+        shutil.rmtree(self.path, ignore_errors=True)
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+from azure.azure_sql_client import AzureSQLClient
+from pipelines.classes.abstract_task import AbstractTask
+from pipelines.utils.status_codes import StatusCode
+from pipelines.utils.task_wrapper import run_task
+
+
+class DagRunner:
+    """
+    Runs AbstractTasks in dependency order, independent tasks concurrently.
+
+    Every attempt gets its own AzureSQLClient (a pooled connection when the pool is open), and is
+    retried / timed out according to the task's class attributes. A dependency that ends in anything
+    but SUCCESS (NO_DATA included) skips everything downstream of it instead of ending the process.
+    Dependencies that are not part of this graph are treated as already satisfied.
+    """
+
+    def __init__(self, tasks: list[type[AbstractTask]], task_kwargs: dict[type[AbstractTask], dict] | None = None):
+        self.tasks = tasks
+        self.task_kwargs = task_kwargs or {}
+        self._check_acyclic()
+
+    def _check_acyclic(self):
+        visiting, done = set(), set()
+
+        def visit(task: type[AbstractTask]):
+            if task in done:
+                return
+            if task in visiting:
+                raise ValueError(f"Dependency cycle through {task.__name__}")
+            visiting.add(task)
+            for dependency in task.depends_on:
+                if dependency in self.tasks:
+                    visit(dependency)
+            visiting.discard(task)
+            done.add(task)
+
+        for task in self.tasks:
+            visit(task)
+
+    async def _attempt(self, task: type[AbstractTask]) -> StatusCode:
+        async with AzureSQLClient() as sql:
+            try:
+                return await asyncio.wait_for(
+                    run_task(task, sql, **self.task_kwargs.get(task, {})),
+                    timeout=task.timeout,
+                )
+            except asyncio.TimeoutError:
+                logging.error(f"{task.__name__} timed out after {task.timeout} seconds")
+                return StatusCode.ERROR
+
+    async def _run_node(self, task: type[AbstractTask], results: dict) -> StatusCode:
+        for dependency in task.depends_on:
+            if dependency not in results:
+                continue
+            status = await results[dependency]
+            if status != StatusCode.SUCCESS:
+                logging.info(f"Skipping {task.__name__}, {dependency.__name__} finished with {status.name}")
+                return StatusCode.SKIPPED
+
+        for attempt in range(1, task.retries + 2):
+            status = await self._attempt(task)
+            if status != StatusCode.ERROR or attempt > task.retries:
+                return status
+            logging.warning(f"{task.__name__} failed, retrying in {task.retry_backoff}s ({attempt}/{task.retries})")
+            await asyncio.sleep(task.retry_backoff)
+
+    async def run(self) -> dict[str, StatusCode]:
+        results = {}
+        for task in self.tasks:
+            results[task] = asyncio.ensure_future(self._run_node(task, results))
+
+        await asyncio.gather(*results.values())
+        return {task.__name__: future.result() for task, future in results.items()}
@@ -3,18 +3,25 @@ import os
 import sys
 from datetime import datetime
 
-LOG_DIRECTORY = f"/app/log/{datetime.now().year}/{datetime.now().month}/{datetime.now().day}/"
 
-os.makedirs(LOG_DIRECTORY, exist_ok=True)
-# Clear existing handlers (optional, useful if script is reloaded in some environments)
-for handler in logging.root.handlers[:]:
-    logging.root.removeHandler(handler)
+def log_directory() -> str:
+    now = datetime.now()
+    return f"/app/log/{now.year}/{now.month}/{now.day}/"
+
 
 def configure_logger(name: str | None = None) -> logging.Logger:
     """Configure and return a logger for the given name."""
     if name is None:
         name = 'cron' if '--cron' in sys.argv else 'manual'
-    log_file = LOG_DIRECTORY + name + '.log'
+
+    # done here rather than at import, so importing a task doesn't touch the filesystem
+    directory = log_directory()
+    os.makedirs(directory, exist_ok=True)
+    log_file = directory + name + '.log'
+
+    # Clear existing handlers (optional, useful if script is reloaded in some environments)
+    for handler in logging.root.handlers[:]:
+        logging.root.removeHandler(handler)
 
     logging.basicConfig(
         level=logging.INFO,
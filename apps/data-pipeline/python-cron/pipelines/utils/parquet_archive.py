@@ -0,0 +1,59 @@
+import json
+import os
+import polars as pl
+
+ARCHIVE_DIRECTORY = os.getenv("PIPELINE_ARCHIVE_DIRECTORY", "/app/archive/")
+USER_BUCKETS = 16
+
+
+class ParquetArchive:
+    """
+    Append-only Parquet archive of pipeline tables, hive partitioned by day and user bucket:
+        <table>/date=2025-01-31/user_bucket=07/part-<run_id>-00000.parquet
+
+    manifest.json is the source of truth for which files belong to the archive, files written by a run
+    that died before updating it are ignored. Rows keep their source `id`, so readers can dedupe on it.
+    """
+
+    def __init__(self, directory: str = ARCHIVE_DIRECTORY):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, "manifest.json")
+
+    def load_manifest(self) -> dict:
+        if not os.path.exists(self.manifest_path):
+            return {"tables": {}}
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def save_manifest(self, manifest: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f"{self.manifest_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2, default=str)
+        os.replace(tmp, self.manifest_path)
+
+    def write_batch(self, table: str, df: pl.DataFrame, run_id: str, batch: int) -> list[dict]:
+        """Write one batch split into its partitions, returns manifest entries for the new files."""
+        df = df.with_columns(
+            pl.col("recorded_at").dt.date().cast(pl.Utf8).alias("date"),
+            (pl.col("user_id") % USER_BUCKETS).cast(pl.Int64).alias("user_bucket"),
+        )
+
+        entries = []
+        for (date, bucket), part in df.partition_by(["date", "user_bucket"], as_dict=True).items():
+            relative = os.path.join(table, f"date={date}", f"user_bucket={bucket:02d}", f"part-{run_id}-{batch:05d}.parquet")
+            path = os.path.join(self.directory, relative)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            part.drop("date", "user_bucket").write_parquet(path)
+            entries.append({"path": relative, "rows": part.height, "run_id": run_id})
+        return entries
+
+    def scan(self, table: str) -> pl.LazyFrame:
+        """Lazy scan over everything archived for a table, with date and user_bucket as columns."""
+        files = [
+            os.path.join(self.directory, entry["path"])
+            for entry in self.load_manifest()["tables"].get(table, {}).get("files", [])
+        ]
+        if not files:
+            return pl.LazyFrame()
+        return pl.scan_parquet(files, hive_partitioning=True)
@@ -0,0 +1,68 @@
+import logging
+import os
+from datetime import datetime
+import polars as pl
+from azure.azure_sql_client import AzureSQLClient
+from pipelines.utils.run_window import run_interval_minutes
+
+
+class PollSchedule:
+    """
+    Per user polling interval, stored as next_poll_at / poll_interval_minutes in user_accounts.
+
+    Users with activity go back to the shortest interval (one cron run), everyone else backs off
+    exponentially up to max_minutes, so calls to steam follow how much people actually play.
+    """
+
+    def __init__(
+        self,
+        min_minutes: int | None = None,
+        max_minutes: int | None = None,
+        backoff: float | None = None,
+    ):
+        self.min_minutes = min_minutes or int(os.getenv("PIPELINE_POLL_MIN_MINUTES", run_interval_minutes()))
+        self.max_minutes = max_minutes or int(os.getenv("PIPELINE_POLL_MAX_MINUTES", 24 * 60))
+        self.backoff = backoff or float(os.getenv("PIPELINE_POLL_BACKOFF", 2))
+
+    def next_intervals(self, users: pl.DataFrame, active_ids: list[int]) -> pl.DataFrame:
+        """New interval per user (id, poll_interval_minutes), users needs id and poll_interval_minutes."""
+        return users.select(
+            'id',
+            pl.when(pl.col('id').is_in(pl.Series(active_ids, dtype=pl.Int64)))
+            .then(pl.lit(self.min_minutes))
+            .otherwise(
+                (pl.col('poll_interval_minutes').fill_null(self.min_minutes) * self.backoff)
+                .round(0)
+                .clip(self.min_minutes, self.max_minutes)
+            )
+            .cast(pl.Int64)
+            .alias('poll_interval_minutes'),
+        )
+
+    async def save(self, sql: AzureSQLClient, intervals: pl.DataFrame, window_start: datetime) -> int:
+        """
+        Write every user's interval and next poll time in one statement.
+        next_poll_at (UTC) counts from the start of the run window, not from whenever this runs, so a user
+        on a one run interval is due again exactly when the next cron run starts.
+        """
+        if intervals.is_empty():
+            return 0
+
+        updated = await sql.bulk_execute(
+            '#poll_staging',
+            {'id': 'INT NOT NULL', 'poll_interval_minutes': 'INT NOT NULL'},
+            intervals.rows(),
+            """
+            UPDATE ua
+            SET
+                ua.poll_interval_minutes = s.poll_interval_minutes,
+                ua.next_poll_at = DATEADD(MINUTE, s.poll_interval_minutes, ?)
+            FROM user_accounts ua
+            INNER JOIN #poll_staging s ON s.id = ua.id
+            """,
+            (window_start,),
+        )
+
+        backed_off = intervals.filter(pl.col('poll_interval_minutes') > self.min_minutes).height
+        logging.info(f"Rescheduled {updated} users, {backed_off} backed off past {self.min_minutes} minutes")
+        return updated
@@ -0,0 +1,28 @@
+import json
+import logging
+import os
+from datetime import datetime
+from telemetry.metrics import metrics
+
+METRICS_DIRECTORY = os.getenv("PIPELINE_METRICS_DIRECTORY", "/app/metrics/")
+
+
+def emit_run_metrics(job_name: str, started_at: datetime):
+    """
+    Write this run's metrics as a timestamped JSON summary (kept, for run over run comparisons)
+    and as <job_name>.prom for the node_exporter textfile collector (overwritten every run).
+    """
+    try:
+        finished_at = datetime.now()
+        run = {
+            "job": job_name,
+            "started_at": started_at.isoformat(),
+            "finished_at": finished_at.isoformat(),
+            "duration_seconds": (finished_at - started_at).total_seconds(),
+        }
+        metrics.write_json(os.path.join(METRICS_DIRECTORY, f"{job_name}-{started_at:%Y%m%d%H%M%S}.json"), **run)
+        metrics.write_prometheus_textfile(os.path.join(METRICS_DIRECTORY, f"{job_name}.prom"))
+        logging.info(f"Run metrics: {json.dumps(metrics.summary(), default=str)}")
+    except OSError as ex:
+        # losing metrics should never fail the job
+        logging.warning(f"Could not write run metrics: {ex}")
@@ -0,0 +1,16 @@
+import os
+from datetime import datetime, timedelta
+
+
+def run_interval_minutes() -> int:
+    """How often cron starts the pipeline (PIPELINE_RUN_INTERVAL_MINUTES), runs in the same window are retries of each other."""
+    return int(os.getenv("PIPELINE_RUN_INTERVAL_MINUTES", 15))
+
+
+def current_window(now: datetime | None = None) -> datetime:
+    """Start of the run window (UTC) that `now` falls in."""
+    now = now or datetime.utcnow()
+    interval = run_interval_minutes()
+    minutes = now.hour * 60 + now.minute
+    start = minutes - minutes % interval
+    return now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(minutes=start)
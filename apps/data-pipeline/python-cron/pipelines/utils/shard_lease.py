@@ -0,0 +1,167 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime
+from azure.azure_sql_client import AzureSQLClient
+
+FINALIZE_SHARD = -1
+
+
+class ShardLeaseManager:
+    """
+    Hands out disjoint shards of a job to competing workers through pipeline_shard_leases.
+
+    A worker claims a shard by writing itself as owner with an expiry, and keeps the lease alive while it
+    works. If it crashes the lease runs out and the next worker to ask for work picks the shard up.
+    """
+
+    def __init__(
+        self,
+        sql: AzureSQLClient,
+        job_name: str,
+        window_start: datetime,
+        shard_count: int,
+        owner: str,
+        lease_seconds: int = 300,
+    ):
+        self.sql = sql
+        self.job_name = job_name
+        self.window_start = window_start
+        self.shard_count = shard_count
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+
+    async def ensure_shards(self):
+        """Create this window's shard rows, safe to race with other workers doing the same."""
+        await self.sql.bulk_execute(
+            '#shards',
+            {'shard_id': 'INT NOT NULL'},
+            [(shard_id,) for shard_id in range(FINALIZE_SHARD, self.shard_count)],
+            """
+            MERGE pipeline_shard_leases WITH (HOLDLOCK) AS target
+            USING #shards AS source
+                ON target.job_name = ?
+                   AND target.window_start = ?
+                   AND target.shard_id = source.shard_id
+            WHEN NOT MATCHED THEN
+                INSERT (job_name, window_start, shard_id, shard_count)
+                VALUES (?, ?, source.shard_id, ?);
+            """,
+            (self.job_name, self.window_start, self.job_name, self.window_start, self.shard_count),
+        )
+
+    async def claim(self, finalize: bool = False) -> int | None:
+        """
+        Take the next free or expired shard, returns its id or None when there is nothing left to do.
+        The finalize shard can only be claimed once every other shard is complete.
+        """
+        shard_filter = "shard_id = -1" if finalize else "shard_id >= 0"
+        res = await self.sql.query_one(
+            f"""
+            SET NOCOUNT ON;
+            UPDATE TOP (1) pipeline_shard_leases WITH (UPDLOCK, READPAST, ROWLOCK)
+            SET
+                owner = ?,
+                lease_expires_at = DATEADD(second, ?, SYSUTCDATETIME()),
+                attempts = attempts + 1
+            OUTPUT INSERTED.shard_id
+            WHERE job_name = ?
+                AND window_start = ?
+                AND {shard_filter}
+                AND completed_at IS NULL
+                AND (owner IS NULL OR lease_expires_at < SYSUTCDATETIME())
+                AND (
+                    ? = 0
+                    OR NOT EXISTS (
+                        SELECT 1
+                        FROM pipeline_shard_leases l
+                        WHERE l.job_name = ?
+                            AND l.window_start = ?
+                            AND l.shard_id >= 0
+                            AND l.completed_at IS NULL
+                    )
+                );
+            """,
+            (
+                self.owner, self.lease_seconds, self.job_name, self.window_start,
+                int(finalize), self.job_name, self.window_start,
+            ),
+        )
+        return res['shard_id'] if res else None
+
+    async def seconds_until_next_expiry(self) -> float | None:
+        """
+        Time until the first lease held by someone else runs out, 0 when a shard is free to claim right now.
+        None once every shard of the window, finalize included, is complete.
+        The finalize shard only counts once every data shard is complete, until then it is unowned
+        but can't be claimed, and counting it would make idle workers poll instead of wait.
+        """
+        res = await self.sql.query_one(
+            """
+            WITH OpenShards AS (
+                SELECT shard_id, owner, lease_expires_at
+                FROM pipeline_shard_leases
+                WHERE job_name = ?
+                    AND window_start = ?
+                    AND completed_at IS NULL
+            )
+            SELECT
+                COUNT(*) AS remaining,
+                MIN(CASE WHEN owner IS NULL THEN SYSUTCDATETIME() ELSE lease_expires_at END) AS next_expiry,
+                SYSUTCDATETIME() AS now
+            FROM OpenShards
+            WHERE shard_id >= 0
+                OR NOT EXISTS (SELECT 1 FROM OpenShards WHERE shard_id >= 0)
+            """,
+            (self.job_name, self.window_start),
+        )
+        if not res or not res['remaining']:
+            return None
+        return max(0.0, (res['next_expiry'] - res['now']).total_seconds())
+
+    async def _update(self, shard_id: int, set_clause: str, params: tuple = (), sql: AzureSQLClient | None = None) -> int:
+        return await (sql or self.sql).nonquery(
+            f"""
+            UPDATE pipeline_shard_leases
+            SET {set_clause}
+            WHERE job_name = ?
+                AND window_start = ?
+                AND shard_id = ?
+                AND owner = ?
+            """,
+            (*params, self.job_name, self.window_start, shard_id, self.owner),
+        )
+
+    async def complete(self, shard_id: int):
+        await self._update(shard_id, "completed_at = SYSUTCDATETIME()")
+
+    async def release(self, shard_id: int):
+        """Give a shard back straight away instead of waiting for the lease to expire."""
+        await self._update(shard_id, "owner = NULL, lease_expires_at = NULL")
+
+    async def _renew_forever(self, shard_id: int):
+        # own connection, the worker's client is busy running the task
+        async with AzureSQLClient() as sql:
+            while True:
+                await asyncio.sleep(self.lease_seconds / 3)
+                renewed = await self._update(
+                    shard_id,
+                    "lease_expires_at = DATEADD(second, ?, SYSUTCDATETIME())",
+                    (self.lease_seconds,),
+                    sql=sql,
+                )
+                if not renewed:
+                    logging.warning(f"Lost lease on shard {shard_id} of {self.job_name}")
+                    return
+
+    @asynccontextmanager
+    async def hold(self, shard_id: int):
+        """Keep the lease on shard_id alive for the duration of the block, release it if the block fails."""
+        renew_task = asyncio.create_task(self._renew_forever(shard_id))
+        try:
+            yield
+        except BaseException:
+            await self.release(shard_id)
+            raise
+        finally:
+            renew_task.cancel()
@@ -5,3 +5,4 @@ class StatusCode(Enum):
     SUCCESS = 0
     ERROR = 1
     NO_DATA = 2
+    SKIPPED = 3
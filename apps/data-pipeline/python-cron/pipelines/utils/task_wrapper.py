@@ -2,37 +2,43 @@ import time
 import logging
 from pipelines.classes.abstract_task import AbstractTask
 from pipelines.utils.status_codes import StatusCode
+from telemetry.metrics import metrics, task_scope
 
 
-async def timed_execute(cls, *args, **kwargs):
+async def run_task(cls, *args, **kwargs) -> StatusCode:
     """
-    Run any AbstractTask subclass:
+    Run any AbstractTask subclass and return its status instead of exiting:
     - Instantiates the class
     - Executes it
     - Logs timing, errors, and status codes
+    Exceptions are logged and reported as StatusCode.ERROR.
+    HTTP and SQL metrics recorded while it runs are labelled with the task name.
     """
-    start_time = time.time()
+    start_time = time.perf_counter()
     cls_name = cls.__name__
 
     if not issubclass(cls, AbstractTask):
         raise TypeError(f"{cls_name} must inherit from AbstractTask")
 
-    try:
-        task_instance = cls(*args, **kwargs)
-        result = await task_instance.execute()
-    except Exception as ex:
-        logging.error(f"Error during {cls_name}.execute:", exc_info=ex)
-        exit(1)
+    with task_scope(cls_name):
+        try:
+            task_instance = cls(*args, **kwargs)
+            result = await task_instance.execute()
+        except Exception as ex:
+            logging.error(f"Error during {cls_name}.execute:", exc_info=ex)
+            result = StatusCode.ERROR
+
+        elapsed_time = time.perf_counter() - start_time
+        metrics.histogram("task_duration_seconds", "Wall time per task run").observe(elapsed_time)
+        metrics.counter("task_runs_total", "Task runs by status").inc(status=result.name)
 
     if result == StatusCode.ERROR:
         logging.error(f"{cls_name}.execute encountered an error.")
-        exit(1)
+        return result
 
-    elapsed_time = time.time() - start_time
     logging.info(f"{cls_name}.execute took {elapsed_time:.6f} seconds")
 
     if result == StatusCode.NO_DATA:
         logging.info(f"{cls_name}.execute returned status code: {result.name}")
-        exit(0)
 
     return result
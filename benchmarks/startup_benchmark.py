@@ -0,0 +1,136 @@
+"""
+Import-time benchmark for the backend (main:app) and the cron entry point, with a regression budget.
+
+Each target is imported in a fresh interpreter, like a uvicorn reload or an hourly cron start, a few times over.
+The median import time is compared against benchmarks/startup_budget.json and the script exits 1
+when a target goes over, so it can run in CI next to the other checks.
+
+    python benchmarks/startup_benchmark.py
+    python benchmarks/startup_benchmark.py --runs 15 --top 15 --json startup.json
+    python benchmarks/startup_benchmark.py --write-budget   # after an intentional change, current medians + headroom
+
+Run it from the environment the apps run in (requirements installed), timings include everything imported.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_PATH = os.path.join(ROOT, "benchmarks", "startup_budget.json")
+SHARED_PACKAGES = os.path.join(ROOT, "package", "python")
+
+TARGETS = {
+    "backend": {
+        "cwd": os.path.join(ROOT, "apps", "backend", "source"),
+        "statement": "from main import app",
+        # main builds the FastAPI app at import and reads these from config
+        "env": {"APP_NAME": "startup-benchmark", "LOCAL_DEV": "false"},
+    },
+    "cron": {
+        "cwd": os.path.join(ROOT, "apps", "data-pipeline", "python-cron"),
+        "statement": "import pipelines.calculate_playtime.calculate_playtime",
+        "env": {},
+    },
+}
+
+TIMER = "import time; _t = time.perf_counter(); {statement}; print(time.perf_counter() - _t)"
+
+
+def run_once(target: dict) -> tuple[float, str]:
+    """Import the target in a new interpreter, returns seconds spent importing and the -X importtime report."""
+    env = {**os.environ, **{k: v for k, v in target["env"].items() if k not in os.environ}}
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [target["cwd"], SHARED_PACKAGES, env.get("PYTHONPATH")]))
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", TIMER.format(statement=target["statement"])],
+        cwd=target["cwd"],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {target['statement']} failed:\n{result.stderr[-2000:]}")
+    return float(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def slowest_packages(report: str, top: int) -> list[tuple[str, float]]:
+    """Top-level packages by total self import time, from python -X importtime output."""
+    packages: dict[str, float] = {}
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(self_us) / 1000
+    return sorted(packages.items(), key=lambda package: package[1], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--top", type=int, default=10, help="slowest packages to list per target")
+    parser.add_argument("--targets", nargs="+", choices=list(TARGETS), default=list(TARGETS))
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--write-budget", action="store_true", help="store current medians plus --headroom as the budget")
+    parser.add_argument("--headroom", type=float, default=1.25)
+    args = parser.parse_args()
+
+    budget = {}
+    if os.path.exists(BUDGET_PATH):
+        with open(BUDGET_PATH) as f:
+            budget = json.load(f)
+
+    results = {}
+    over_budget = []
+    for name in args.targets:
+        target = TARGETS[name]
+        # first run compiles .pyc files, it would only measure the bytecode cache being cold
+        run_once(target)
+        timings = []
+        report = ""
+        for _ in range(args.runs):
+            seconds, report = run_once(target)
+            timings.append(seconds * 1000)
+
+        median = statistics.median(timings)
+        limit = budget.get(name, {}).get("import_ms")
+        results[name] = {
+            "median_ms": round(median, 1),
+            "min_ms": round(min(timings), 1),
+            "max_ms": round(max(timings), 1),
+            "budget_ms": limit,
+            "slowest_packages_ms": {package: round(ms, 1) for package, ms in slowest_packages(report, args.top)},
+        }
+
+        status = "no budget" if limit is None else ("OK" if median <= limit else "OVER BUDGET")
+        print(f"{name}: median {median:.0f}ms (min {min(timings):.0f}, max {max(timings):.0f}), budget {limit}ms -> {status}")
+        for package, ms in slowest_packages(report, args.top):
+            print(f"    {ms:8.1f}ms  {package}")
+        if limit is not None and median > limit:
+            over_budget.append(name)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.write_budget:
+        for name, result in results.items():
+            budget[name] = {"import_ms": round(result["median_ms"] * args.headroom)}
+        with open(BUDGET_PATH, "w") as f:
+            json.dump(budget, f, indent=2)
+            f.write("\n")
+        print(f"Wrote budget to {BUDGET_PATH}")
+        return
+
+    if over_budget:
+        print(f"Import time over budget for: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
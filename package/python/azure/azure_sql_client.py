@@ -1,12 +1,39 @@
+from __future__ import annotations
+
 import os
-from typing import Optional, Sequence
-from dotenv import load_dotenv
-import aioodbc
+import time
+import asyncio
+import logging
+import functools
+from typing import TYPE_CHECKING, AsyncIterator, Optional, Sequence
+from telemetry.metrics import metrics
+
+# aioodbc (and the ODBC driver behind it), polars and dotenv are imported on first use,
+# so importing this module stays cheap for entry points that never touch them
+if TYPE_CHECKING:
+    import aioodbc
+    import polars as pl
+
+
+@functools.cache
+def _load_env():
+    from dotenv import load_dotenv
+    load_dotenv()
 
 
 class AzureSQLClient:
+    # SQL Server caps a statement at 2100 parameters and a VALUES list at 1000 rows
+    MAX_PARAMS = 2100
+    MAX_VALUES_ROWS = 1000
+
+    # Process-wide aioodbc pool, opened by the app / pipeline entry point.
+    # While it is open each client borrows a connection on connect() and hands it back on close().
+    _pool: aioodbc.Pool | None = None
+    _acquire_timeout: float = 10.0
+    _health_check: bool = True
+
     def __init__(self, conn_string: Optional[str] = None):
-        load_dotenv()
+        _load_env()
         self.conn_string = conn_string or os.getenv("AZURE_SQL_CONN_STRING")
         if not self.conn_string:
             raise ValueError(
@@ -15,6 +42,84 @@ class AzureSQLClient:
         self.conn = None
         self.cursor = None
         self.autocommit = True
+        self._pooled = False
+
+    @classmethod
+    async def open_pool(
+        cls,
+        conn_string: Optional[str] = None,
+        min_size: int | None = None,
+        max_size: int | None = None,
+        acquire_timeout: float | None = None,
+        recycle_seconds: int | None = None,
+        health_check: bool | None = None,
+    ):
+        """
+        Create the process-wide connection pool. Anything not passed is read from env
+        (AZURE_SQL_POOL_MIN_SIZE, AZURE_SQL_POOL_MAX_SIZE, AZURE_SQL_POOL_ACQUIRE_TIMEOUT,
+        AZURE_SQL_POOL_RECYCLE, AZURE_SQL_POOL_HEALTH_CHECK).
+        """
+        if cls._pool is not None:
+            return
+
+        _load_env()
+        conn_string = conn_string or os.getenv("AZURE_SQL_CONN_STRING")
+        if not conn_string:
+            raise ValueError(
+                "Connection string not provided and AZURE_SQL_CONN_STRING not found in env."
+            )
+        if min_size is None:
+            min_size = int(os.getenv("AZURE_SQL_POOL_MIN_SIZE", 1))
+        if max_size is None:
+            max_size = int(os.getenv("AZURE_SQL_POOL_MAX_SIZE", 10))
+        if acquire_timeout is None:
+            acquire_timeout = float(os.getenv("AZURE_SQL_POOL_ACQUIRE_TIMEOUT", 10))
+        if recycle_seconds is None:
+            recycle_seconds = int(os.getenv("AZURE_SQL_POOL_RECYCLE", 1800))
+        if health_check is None:
+            health_check = os.getenv("AZURE_SQL_POOL_HEALTH_CHECK", "true").lower() == "true"
+
+        import aioodbc
+        AzureSQLClient._pool = await aioodbc.create_pool(
+            dsn=conn_string,
+            minsize=min_size,
+            maxsize=max_size,
+            pool_recycle=recycle_seconds,
+            autocommit=True,
+        )
+        AzureSQLClient._acquire_timeout = acquire_timeout
+        AzureSQLClient._health_check = health_check
+
+    @classmethod
+    async def close_pool(cls):
+        if AzureSQLClient._pool is not None:
+            AzureSQLClient._pool.close()
+            await AzureSQLClient._pool.wait_closed()
+            AzureSQLClient._pool = None
+
+    async def _acquire(self):
+        """Borrow a connection from the pool, dropping any that fail a ping."""
+        pool = AzureSQLClient._pool
+        while True:
+            try:
+                conn = await asyncio.wait_for(pool.acquire(), timeout=self._acquire_timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(
+                    f"Timed out after {self._acquire_timeout}s waiting for a pooled SQL connection"
+                )
+
+            if not self._health_check:
+                return conn
+
+            try:
+                async with conn.cursor() as cursor:
+                    await cursor.execute("SELECT 1")
+                    await cursor.fetchone()
+                return conn
+            except Exception as ex:
+                logging.warning(f"Discarding unhealthy pooled SQL connection: {ex}")
+                await conn.close()
+                await pool.release(conn)
 
     async def __aexit(self):
         if self.conn:
@@ -23,9 +128,15 @@ class AzureSQLClient:
     async def connect(self):
         """Establish the database connection if not already connected."""
         if not self.conn:
-            self.conn = await aioodbc.connect(
-                dsn=self.conn_string, autocommit=self.autocommit
-            )
+            if AzureSQLClient._pool is not None:
+                self.conn = await self._acquire()
+                self.conn.autocommit = self.autocommit
+                self._pooled = True
+            else:
+                import aioodbc
+                self.conn = await aioodbc.connect(
+                    dsn=self.conn_string, autocommit=self.autocommit
+                )
             self.cursor = await self.conn.cursor()
 
     async def set_autocommit(self, autocommit: bool):
@@ -36,14 +147,17 @@ class AzureSQLClient:
 
     async def query(self, query: str, params: Optional[Sequence] = None) -> list:
         """
-        Execute a SELECT query and return results as a Polars DataFrame.
+        Execute a SELECT query and return results as a list of dicts.
+        Prefer query_frame / query_stream for anything bigger than a handful of rows.
         """
         await self.connect()
         params = params or []
 
+        started = time.perf_counter()
         await self.cursor.execute(query, params if params else ())
         columns = [desc[0] for desc in self.cursor.description]
         rows = await self.cursor.fetchall()
+        self._record("query", started, fetched=len(rows))
 
         if not rows:
             return []
@@ -51,6 +165,73 @@ class AzureSQLClient:
         data = [dict(zip(columns, row)) for row in rows]
         return data
 
+    @staticmethod
+    def _record(op: str, started: float, fetched: int = 0, written: int = 0):
+        metrics.histogram("sql_query_seconds", "SQL execution time by operation").observe(
+            time.perf_counter() - started, op=op
+        )
+        if fetched > 0:
+            metrics.counter("sql_rows_fetched_total", "Rows read from SQL").inc(fetched, op=op)
+        if written > 0:
+            metrics.counter("sql_rows_written_total", "Rows affected by SQL writes").inc(written, op=op)
+
+    @staticmethod
+    def _rows_to_frame(columns: list[str], rows: Sequence, schema: Optional[dict] = None) -> pl.DataFrame:
+        """Transpose fetched rows into one buffer per column and build typed Series from those."""
+        import polars as pl
+        schema = schema or {}
+        buffers = list(zip(*rows)) if rows else [() for _ in columns]
+        return pl.DataFrame([
+            pl.Series(name, list(values), dtype=schema.get(name))
+            for name, values in zip(columns, buffers)
+        ])
+
+    async def query_stream(
+        self,
+        query: str,
+        params: Optional[Sequence] = None,
+        batch_size: int = 10_000,
+        schema: Optional[dict] = None,
+    ) -> AsyncIterator[pl.DataFrame]:
+        """
+        Execute a SELECT query and yield it as DataFrames of at most batch_size rows,
+        so memory stays bounded no matter how big the result is.
+        An empty result yields a single empty frame with the query's columns.
+        schema maps column name -> polars dtype, anything missing is inferred.
+        """
+        await self.connect()
+        cursor = await self.conn.cursor()
+        try:
+            started = time.perf_counter()
+            await cursor.execute(query, params if params else ())
+            columns = [desc[0] for desc in cursor.description]
+            yielded = False
+            while True:
+                rows = await cursor.fetchmany(batch_size)
+                self._record("query_stream", started, fetched=len(rows))
+                started = time.perf_counter()
+                if not rows:
+                    break
+                yielded = True
+                yield self._rows_to_frame(columns, rows, schema)
+
+            if not yielded:
+                yield self._rows_to_frame(columns, [], schema)
+        finally:
+            await cursor.close()
+
+    async def query_frame(
+        self,
+        query: str,
+        params: Optional[Sequence] = None,
+        schema: Optional[dict] = None,
+        batch_size: int = 10_000,
+    ) -> pl.DataFrame:
+        """Execute a SELECT query and return results as a Polars DataFrame."""
+        import polars as pl
+        frames = [frame async for frame in self.query_stream(query, params, batch_size, schema)]
+        return pl.concat(frames, how="vertical_relaxed", rechunk=True)
+
     async def query_one(self, query: str, params: Optional[Sequence] = None) -> dict | None:
         res = await self.query(query, params)
         return res[0] if len(res) > 0 else None
@@ -63,22 +244,77 @@ class AzureSQLClient:
         await self.connect()
         params = params or []
 
+        started = time.perf_counter()
         if params and isinstance(params, list) and isinstance(params[0], (list, tuple)):
             await self.cursor.executemany(query, params)
         else:
             await self.cursor.execute(query, params if params else ())
 
         await self.conn.commit()
+        self._record("nonquery", started, written=self.cursor.rowcount)
         return self.cursor.rowcount
 
+    async def bulk_load(self, staging_table: str, columns: dict[str, str], rows: Sequence[Sequence]) -> int:
+        """
+        Create a temp table ({name: sql type}) and fill it with multi-row INSERTs,
+        so the number of round trips scales with batches instead of rows.
+        Returns the number of rows loaded.
+        """
+        await self.connect()
+        column_defs = ", ".join(f"{name} {sql_type}" for name, sql_type in columns.items())
+        await self.cursor.execute(f"DROP TABLE IF EXISTS {staging_table}")
+        await self.cursor.execute(f"CREATE TABLE {staging_table} ({column_defs})")
+
+        batch_size = min(self.MAX_VALUES_ROWS, (self.MAX_PARAMS - 1) // len(columns))
+        placeholder = "(" + ", ".join("?" * len(columns)) + ")"
+        insert = f"INSERT INTO {staging_table} ({', '.join(columns)}) VALUES "
+
+        loaded = 0
+        started = time.perf_counter()
+        for i in range(0, len(rows), batch_size):
+            batch = rows[i:i + batch_size]
+            params = [value for row in batch for value in row]
+            await self.cursor.execute(insert + ", ".join([placeholder] * len(batch)), params)
+            loaded += len(batch)
+
+        await self.conn.commit()
+        self._record("bulk_load", started, written=loaded)
+        return loaded
+
+    async def bulk_execute(
+        self,
+        staging_table: str,
+        columns: dict[str, str],
+        rows: Sequence[Sequence],
+        statement: str,
+        params: Optional[Sequence] = None,
+    ) -> int:
+        """
+        Load rows into a temp table, run one set-based statement against it (MERGE, UPDATE ... FROM, ...)
+        and drop it again. Returns the number of rows affected by the statement.
+        """
+        await self.bulk_load(staging_table, columns, rows)
+        try:
+            return await self.nonquery(statement, params)
+        finally:
+            await self.cursor.execute(f"DROP TABLE IF EXISTS {staging_table}")
+
     async def close(self):
-        """Close the cursor and connection."""
+        """Close the cursor and connection, or hand the connection back to the pool."""
         if self.cursor:
             await self.cursor.close()
         if self.conn:
-            await self.conn.close()
+            if self._pooled:
+                # leave pooled connections the way we found them
+                if not self.autocommit:
+                    await self.conn.rollback()
+                    self.conn.autocommit = True
+                await AzureSQLClient._pool.release(self.conn)
+            else:
+                await self.conn.close()
         self.conn = None
         self.cursor = None
+        self._pooled = False
 
     async def __aenter__(self):
         await self.connect()
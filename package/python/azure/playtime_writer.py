@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import TYPE_CHECKING
+from azure.azure_sql_client import AzureSQLClient
+
+if TYPE_CHECKING:
+    import polars as pl
+
+
+class PlaytimeWriter:
+    """
+    Writes GetRecentlyPlayedGames snapshots into steam_apps and playtime_forever_historic.
+    Shared by the pipeline import and the backend backfill so both write the same way.
+    """
+
+    APPS_STAGING = {'app_id': 'BIGINT NOT NULL', 'name': 'NVARCHAR(255) NOT NULL', 'img_url': 'NVARCHAR(255) NULL'}
+    PLAYTIME_STAGING = {'app_id': 'INT NOT NULL', 'user_id': 'INT NOT NULL', 'playtime_forever': 'INT NOT NULL'}
+
+    def __init__(self, sql: AzureSQLClient):
+        self.sql = sql
+
+    async def insert_apps(self, apps: pl.DataFrame) -> int:
+        """Insert apps (app_id, name, img_url) that steam_apps doesn't have yet, returns how many were new."""
+        import polars as pl
+
+        rows = (
+            apps
+            .unique(subset='app_id')
+            .select(
+                pl.col('app_id').cast(pl.Int64),
+                pl.col('name').fill_null(''),
+                pl.col('img_url'),
+            )
+            .rows()
+        )
+        if not rows:
+            return 0
+
+        return await self.sql.bulk_execute(
+            '#apps_staging',
+            self.APPS_STAGING,
+            rows,
+            """
+            INSERT INTO dbo.steam_apps (app_id, name, img_url)
+            SELECT s.app_id, s.name, s.img_url
+            FROM #apps_staging s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM dbo.steam_apps a WHERE a.app_id = s.app_id
+            );
+            """,
+        )
+
+    async def merge_snapshot(self, games: pl.DataFrame, recorded_at: datetime | None = None) -> int:
+        """
+        Merge one snapshot (app_id, user_id, playtime_forever) into playtime_forever_historic in one statement.
+        An unchanged playtime only refreshes recorded_at, a changed one adds a row. Returns rows affected.
+        """
+        import polars as pl
+
+        rows = (
+            games
+            .select(
+                pl.col('app_id').cast(pl.Int64),
+                pl.col('user_id').cast(pl.Int64),
+                pl.col('playtime_forever').cast(pl.Int64),
+            )
+            # MERGE refuses two source rows for the same target row
+            .unique(subset=['app_id', 'user_id'])
+            .rows()
+        )
+        if not rows:
+            return 0
+
+        recorded_at = recorded_at or datetime.now()
+        return await self.sql.bulk_execute(
+            '#playtime_staging',
+            self.PLAYTIME_STAGING,
+            rows,
+            """
+            MERGE dbo.playtime_forever_historic AS target
+            USING #playtime_staging AS source
+                ON target.app_id = source.app_id
+                   AND target.user_id = source.user_id
+                   AND target.playtime_forever = source.playtime_forever
+            WHEN MATCHED THEN
+                UPDATE SET recorded_at = ?
+            WHEN NOT MATCHED THEN
+                INSERT (app_id, user_id, playtime_forever, recorded_at)
+                VALUES (source.app_id, source.user_id, source.playtime_forever, ?);
+            """,
+            (recorded_at, recorded_at),
+        )
@@ -0,0 +1,56 @@
+"""
+Compact msgspec structs for the hot pipeline endpoints, decoded straight from the response bytes.
+Only the fields declared here are kept, msgspec skips everything else in the payload without building it.
+The pydantic models next to this file stay the shape returned by the API.
+"""
+import msgspec
+from msgspec.structs import astuple
+
+
+class PlayerActivity(msgspec.Struct):
+    """The part of GetPlayerSummaries the pipeline's activity check reads."""
+    steamid: str
+    profilestate: int = 0
+    personastate: int = 0
+    lastlogoff: int | None = None
+
+
+class PlayerSummariesBody(msgspec.Struct):
+    players: list[PlayerActivity] = []
+
+
+class PlayerSummariesResponse(msgspec.Struct):
+    response: PlayerSummariesBody
+
+
+class RecentlyPlayedGame(msgspec.Struct):
+    appid: int
+    name: str = ""
+    playtime_2weeks: int = 0
+    playtime_forever: int = 0
+
+
+class RecentlyPlayedGameWithIcon(RecentlyPlayedGame):
+    img_icon_url: str = ""
+
+
+class RecentlyPlayedGamesBody(msgspec.Struct):
+    games: list[RecentlyPlayedGame] = []
+
+
+class RecentlyPlayedGamesWithIconBody(msgspec.Struct):
+    games: list[RecentlyPlayedGameWithIcon] = []
+
+
+class RecentlyPlayedGamesResponse(msgspec.Struct):
+    response: RecentlyPlayedGamesBody
+
+
+class RecentlyPlayedGamesWithIconResponse(msgspec.Struct):
+    response: RecentlyPlayedGamesWithIconBody
+
+
+# decoders are reusable and cheaper than building one per call
+player_summaries_decoder = msgspec.json.Decoder(PlayerSummariesResponse)
+recently_played_decoder = msgspec.json.Decoder(RecentlyPlayedGamesResponse)
+recently_played_with_icon_decoder = msgspec.json.Decoder(RecentlyPlayedGamesWithIconResponse)
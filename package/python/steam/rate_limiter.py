@@ -0,0 +1,86 @@
+import asyncio
+import time
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """
+    Pacing settings for a single Steam endpoint.
+    rate is requests per second, burst is the token bucket size.
+    """
+    rate: float
+    burst: int
+    max_in_flight: int
+
+
+class RateLimiter:
+    """
+    Token bucket + in-flight cap shared by every caller of an endpoint.
+
+    Use as `async with limiter:` around a single HTTP attempt. The rate backs off
+    when Steam answers 429 and slowly climbs back to the configured rate on success.
+    """
+
+    # multiplicative decrease on 429, additive increase on success
+    BACKOFF_FACTOR = 0.5
+    RECOVERY_STEP = 0.05  # fraction of the configured rate regained per success
+    MIN_RATE = 0.1  # requests per second
+
+    def __init__(self, limit: RateLimit):
+        self.limit = limit
+        self.rate = limit.rate
+        self.tokens = float(limit.burst)
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+        self._in_flight = asyncio.Semaphore(limit.max_in_flight)
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated_at
+        self.tokens = min(float(self.limit.burst), self.tokens + elapsed * self.rate)
+        self.updated_at = now
+
+    async def _take_token(self):
+        # the lock makes waiters queue up in order instead of all waking at once
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    async def __aenter__(self):
+        await self._in_flight.acquire()
+        try:
+            await self._take_token()
+        except BaseException:
+            self._in_flight.release()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._in_flight.release()
+
+    def on_success(self):
+        if self.rate < self.limit.rate:
+            self.rate = min(self.limit.rate, self.rate + self.limit.rate * self.RECOVERY_STEP)
+
+    def on_rate_limited(self, retry_after: float | None):
+        """
+        Slow the bucket down after a 429.
+        If Steam told us how long to wait, nobody sends anything until then.
+        """
+        now = time.monotonic()
+        self._refill(now)
+        self.rate = max(self.MIN_RATE, self.rate * self.BACKOFF_FACTOR)
+        self.tokens = 0.0
+        if retry_after:
+            self.paused_until = max(self.paused_until, now + retry_after)
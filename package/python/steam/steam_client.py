@@ -1,11 +1,43 @@
-from steam.models.steam_user import SteamUser
+from __future__ import annotations
+
 import os
+import time
 import asyncio
+import logging
+import functools
+import importlib.util
+import weakref
 import httpx
-import polars as pl
-from dotenv import load_dotenv
-from urllib.parse import urlencode
-from steam.models.recently_played_games_response import RecentlyPlayedGamesResponse
+from typing import TYPE_CHECKING
+from urllib.parse import urlencode, urlparse
+from steam.rate_limiter import RateLimit, RateLimiter
+from steam.cache import TTLCache
+from steam.summary_batcher import SummaryBatcher
+from telemetry.metrics import metrics
+
+# polars, pydantic models, msgspec and dotenv are imported on first use, the backend's login path
+# never needs polars and an hourly cron start shouldn't pay for what a task doesn't call
+if TYPE_CHECKING:
+    import polars as pl
+    from steam.models.steam_user import SteamUser
+
+
+@functools.cache
+def _load_env():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+
+@functools.cache
+def _steam_structs():
+    """
+    The msgspec structs module, or None when msgspec isn't installed.
+    msgspec is optional, without it responses are decoded through response.json() like before.
+    """
+    if importlib.util.find_spec("msgspec") is None:
+        return None
+    from steam.models import steam_structs
+    return steam_structs
 
 
 class SteamClient:
@@ -15,19 +47,225 @@ class SteamClient:
     MAX_RETRIES = 5
     BASE_BACKOFF = 0.5  # seconds
 
-    def __init__(self, api_key: str | None = None):
-        load_dotenv()
+    # Pacing per endpoint path, shared by every SteamClient in the process.
+    # Steam allows roughly 100k calls a day per key, bursts above ~10/s start getting 429s.
+    DEFAULT_RATE_LIMIT = RateLimit(rate=10, burst=10, max_in_flight=10)
+    RATE_LIMITS: dict[str, RateLimit] = {
+        "/ISteamUser/GetPlayerSummaries/v2/": RateLimit(rate=5, burst=5, max_in_flight=5),
+        "/IPlayerService/GetRecentlyPlayedGames/v1/": RateLimit(rate=10, burst=10, max_in_flight=10),
+    }
+    _limiters: dict[str, RateLimiter] = {}
+
+    # Process-wide connection pool, opened by the app / pipeline entry point.
+    # Clients created while it is open reuse its warm connections.
+    _shared_client: httpx.AsyncClient | None = None
+
+    # Optional player summary cache keyed by steam id, see enable_summary_cache
+    MAX_SUMMARY_IDS = 100
+    _summary_cache: TTLCache | None = None
+
+    # Identical requests currently on the wire, see _single_flight
+    _inflight: dict[tuple, asyncio.Future] = {}
+
+    # Limiter locks and in-flight futures belong to one event loop, both are dropped when another loop shows up
+    _state_loop: weakref.ref | None = None
+
+    # Optional batching of single user lookups, see enable_summary_batching
+    _summary_batcher: SummaryBatcher | None = None
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        base_url: str | None = None,
+        openid_url: str | None = None,
+    ):
+        _load_env()
         self.api_key = api_key or os.getenv("STEAM_API_KEY")
         if not self.api_key:
             raise ValueError("No Steam API Key provided.")
 
-        self.client = httpx.AsyncClient(
+        # lets benchmarks and local dev point at a stand-in server (STEAM_BASE_URL / STEAM_OPENID_URL)
+        self.BASE_URL = base_url or os.getenv("STEAM_BASE_URL") or SteamClient.BASE_URL
+        self.STEAM_OPENID_URL = openid_url or os.getenv("STEAM_OPENID_URL") or SteamClient.STEAM_OPENID_URL
+
+        if SteamClient._shared_client is not None:
+            self.client = SteamClient._shared_client
+            self._owns_client = False
+        else:
+            self.client = self._build_client()
+            self._owns_client = True
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        # the shared client outlives us, only close a client we built ourselves
+        if self._owns_client:
+            await self.client.aclose()
+
+    @classmethod
+    def _build_client(
+        cls,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+    ) -> httpx.AsyncClient:
+        if http2 and importlib.util.find_spec("h2") is None:
+            logging.warning("HTTP/2 requested for SteamClient but h2 is not installed, using HTTP/1.1")
+            http2 = False
+
+        return httpx.AsyncClient(
             timeout=10,
-            headers={"User-Agent": "FastAPI-SteamClient"}
+            headers={"User-Agent": "FastAPI-SteamClient"},
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            http2=http2,
         )
 
-    async def close(self):
-        await self.client.aclose()
+    @classmethod
+    async def open_shared_client(
+        cls,
+        max_connections: int | None = None,
+        max_keepalive_connections: int | None = None,
+        keepalive_expiry: float | None = None,
+        http2: bool | None = None,
+    ):
+        """
+        Create the process-wide HTTP client. Anything not passed is read from env
+        (STEAM_HTTP_MAX_CONNECTIONS, STEAM_HTTP_MAX_KEEPALIVE, STEAM_HTTP_KEEPALIVE_EXPIRY, STEAM_HTTP2).
+        """
+        if cls._shared_client is not None:
+            return
+
+        _load_env()
+        if max_connections is None:
+            max_connections = int(os.getenv("STEAM_HTTP_MAX_CONNECTIONS", 100))
+        if max_keepalive_connections is None:
+            max_keepalive_connections = int(os.getenv("STEAM_HTTP_MAX_KEEPALIVE", 20))
+        if keepalive_expiry is None:
+            keepalive_expiry = float(os.getenv("STEAM_HTTP_KEEPALIVE_EXPIRY", 30))
+        if http2 is None:
+            http2 = os.getenv("STEAM_HTTP2", "false").lower() == "true"
+
+        SteamClient._shared_client = cls._build_client(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+            http2=http2,
+        )
+
+    @classmethod
+    async def close_shared_client(cls):
+        if SteamClient._shared_client is not None:
+            await SteamClient._shared_client.aclose()
+            SteamClient._shared_client = None
+
+    @classmethod
+    def enable_summary_cache(cls, ttl_seconds: float | None = None, max_size: int | None = None):
+        """
+        Cache GetPlayerSummaries results in process. Anything not passed is read from env
+        (STEAM_SUMMARY_CACHE_TTL, STEAM_SUMMARY_CACHE_SIZE).
+        """
+        _load_env()
+        if ttl_seconds is None:
+            ttl_seconds = float(os.getenv("STEAM_SUMMARY_CACHE_TTL", 300))
+        if max_size is None:
+            max_size = int(os.getenv("STEAM_SUMMARY_CACHE_SIZE", 10_000))
+        SteamClient._summary_cache = TTLCache(ttl=ttl_seconds, max_size=max_size)
+
+    @classmethod
+    def disable_summary_cache(cls):
+        SteamClient._summary_cache = None
+
+    @classmethod
+    def summary_cache_stats(cls) -> dict | None:
+        cache = SteamClient._summary_cache
+        return cache.stats() if cache is not None else None
+
+    @classmethod
+    def enable_summary_batching(cls, window_seconds: float | None = None):
+        """
+        Merge get_steam_user calls made within window_seconds of each other into one GetPlayerSummaries call.
+        Anything not passed is read from env (STEAM_SUMMARY_BATCH_WINDOW_MS).
+        """
+        _load_env()
+        if window_seconds is None:
+            window_seconds = float(os.getenv("STEAM_SUMMARY_BATCH_WINDOW_MS", 10)) / 1000
+        SteamClient._summary_batcher = SummaryBatcher(window_seconds, cls.MAX_SUMMARY_IDS)
+
+    @classmethod
+    def disable_summary_batching(cls):
+        SteamClient._summary_batcher = None
+
+    @classmethod
+    def configure_rate_limit(cls, endpoint: str, limit: RateLimit):
+        """Override the pacing for an endpoint path, e.g. '/ISteamUser/GetPlayerSummaries/v2/'."""
+        cls.RATE_LIMITS = {**cls.RATE_LIMITS, endpoint: limit}
+        cls._limiters.pop(endpoint, None)
+
+    @classmethod
+    def _bind_to_running_loop(cls):
+        loop = asyncio.get_running_loop()
+        if SteamClient._state_loop is None or SteamClient._state_loop() is not loop:
+            SteamClient._state_loop = weakref.ref(loop)
+            SteamClient._limiters = {}
+            SteamClient._inflight = {}
+
+    @classmethod
+    def _get_limiter(cls, url: str) -> RateLimiter:
+        cls._bind_to_running_loop()
+        endpoint = urlparse(url).path
+        limiter = cls._limiters.get(endpoint)
+        if limiter is None:
+            limiter = RateLimiter(cls.RATE_LIMITS.get(endpoint, cls.DEFAULT_RATE_LIMIT))
+            cls._limiters[endpoint] = limiter
+        return limiter
+
+    @staticmethod
+    def _record_retry(endpoint: str, reason: str, wait: float):
+        metrics.counter("steam_http_retries_total", "Steam HTTP retries by reason").inc(endpoint=endpoint, reason=reason)
+        metrics.counter("steam_backoff_seconds_total", "Seconds slept before retrying").inc(wait, endpoint=endpoint)
+
+    @staticmethod
+    def _parse_retry_after(value: str | None) -> float | None:
+        # Steam sends seconds, ignore the HTTP-date form
+        try:
+            return float(value) if value else None
+        except ValueError:
+            return None
+
+    @classmethod
+    async def _single_flight(cls, key: tuple, endpoint: str, send):
+        """
+        Run send() once for every caller asking for the same key at the same time, they all get its result.
+        The call runs as its own task, so a waiter being cancelled never cancels it for the others.
+        """
+        cls._bind_to_running_loop()
+        flight = SteamClient._inflight.get(key)
+        if flight is None:
+            flight = asyncio.ensure_future(send())
+            SteamClient._inflight[key] = flight
+
+            def done(task):
+                if SteamClient._inflight.get(key) is task:
+                    del SteamClient._inflight[key]
+                # mark the error as seen even when every waiter is gone
+                if not task.cancelled():
+                    task.exception()
+
+            flight.add_done_callback(done)
+        else:
+            metrics.counter("steam_coalesced_requests_total", "Steam requests served by an identical in-flight call").inc(
+                endpoint=endpoint
+            )
+        return await asyncio.shield(flight)
 
     async def _request(
         self,
@@ -37,36 +275,83 @@ class SteamClient:
         params: dict | None = None,
         data: dict | None = None,
     ) -> httpx.Response:
+        """Send a request with pacing and retries, concurrent identical GETs share one call."""
+        if method != "GET":
+            return await self._send(method, url, params=params, data=data)
+
+        key = (method, url, tuple(sorted((params or {}).items())))
+        return await self._single_flight(
+            key,
+            urlparse(url).path,
+            lambda: self._send(method, url, params=params, data=data),
+        )
+
+    async def _send(
+        self,
+        method: str,
+        url: str,
+        *,
+        params: dict | None = None,
+        data: dict | None = None,
+    ) -> httpx.Response:
+
+        limiter = self._get_limiter(url)
+        endpoint = urlparse(url).path
 
         for attempt in range(1, self.MAX_RETRIES + 1):
+            backoff = self.BASE_BACKOFF * (2 ** (attempt - 1))
             try:
-                response = await self.client.request(
-                    method,
-                    url,
-                    params=params,
-                    data=data,
+                queued_at = time.perf_counter()
+                async with limiter:
+                    sent_at = time.perf_counter()
+                    metrics.histogram("steam_rate_limit_wait_seconds", "Time spent waiting on the rate limiter").observe(
+                        sent_at - queued_at, endpoint=endpoint
+                    )
+                    try:
+                        response = await self.client.request(
+                            method,
+                            url,
+                            params=params,
+                            data=data,
+                        )
+                    finally:
+                        metrics.histogram("steam_http_request_seconds", "Steam HTTP request latency").observe(
+                            time.perf_counter() - sent_at, endpoint=endpoint
+                        )
+
+                metrics.counter("steam_http_requests_total", "Steam HTTP requests by status").inc(
+                    endpoint=endpoint, status=response.status_code
                 )
 
-                # Rate limited
+                # Rate limited, slow everyone down. A Retry-After pauses the shared
+                # limiter itself so the next attempt already waits for it.
                 if response.status_code == 429:
-                    retry_after = response.headers.get("Retry-After")
-                    wait_time = float(retry_after) if retry_after else self.BASE_BACKOFF * (2 ** (attempt - 1))
-                    await asyncio.sleep(wait_time)
+                    retry_after = self._parse_retry_after(response.headers.get("Retry-After"))
+                    limiter.on_rate_limited(retry_after)
+                    self._record_retry(endpoint, "429", retry_after or backoff)
+                    if not retry_after:
+                        await asyncio.sleep(backoff)
                     continue
 
                 # Retry on transient server errors
                 if response.status_code >= 500:
-                    await asyncio.sleep(self.BASE_BACKOFF * (2 ** (attempt - 1)))
+                    self._record_retry(endpoint, "5xx", backoff)
+                    await asyncio.sleep(backoff)
                     continue
 
+                limiter.on_success()
                 response.raise_for_status()
                 return response
 
             except httpx.RequestError:
                 # Network issue
+                metrics.counter("steam_http_requests_total", "Steam HTTP requests by status").inc(
+                    endpoint=endpoint, status="network_error"
+                )
                 if attempt == self.MAX_RETRIES:
                     raise
-                await asyncio.sleep(self.BASE_BACKOFF * (2 ** (attempt - 1)))
+                self._record_retry(endpoint, "network", backoff)
+                await asyncio.sleep(backoff)
 
         raise RuntimeError("Max retries exceeded")
 
@@ -74,11 +359,58 @@ class SteamClient:
     # Steam Web API
     # --------------------------------------------------
 
+    IMG_ICON_BASE_URL = "http://media.steampowered.com/steamcommunity/public/images/apps"
+
     @classmethod
     def map_img_icon_hash_to_url(cls, app_id:str, hash:str) -> str:
-        return f"http://media.steampowered.com/steamcommunity/public/images/apps/{app_id}/{hash}.jpg"
+        return f"{cls.IMG_ICON_BASE_URL}/{app_id}/{hash}.jpg"
+
+    @classmethod
+    def img_icon_url_expr(cls, app_id: str = 'app_id', hash: str = 'img_icon_url') -> pl.Expr:
+        """Same as map_img_icon_hash_to_url but as a polars expression, null when there is no icon."""
+        import polars as pl
+        return (
+            pl.when(pl.col(hash).is_not_null() & (pl.col(hash) != ''))
+            .then(pl.concat_str([
+                pl.lit(f"{cls.IMG_ICON_BASE_URL}/"),
+                pl.col(app_id).cast(pl.Utf8),
+                pl.lit('/'),
+                pl.col(hash),
+                pl.lit('.jpg'),
+            ]))
+            .otherwise(None)
+        )
+
+    @staticmethod
+    def recently_played_schema(include_icons: bool = True) -> dict:
+        import polars as pl
+        schema = {
+            'app_id': pl.Int64,
+            'name': pl.Utf8,
+            'playtime_2weeks': pl.Int64,
+            'playtime_forever': pl.Int64,
+        }
+        if include_icons:
+            schema['img_icon_url'] = pl.Utf8
+        return schema
+
+    @staticmethod
+    def player_activity_schema() -> dict:
+        import polars as pl
+        return {
+            'steamid': pl.Utf8,
+            'profilestate': pl.Int64,
+            'personastate': pl.Int64,
+            'lastlogoff': pl.Int64,
+        }
+
+    async def get_recently_played_games(self, id64: str, include_icons: bool = True) -> pl.DataFrame:
+        """
+        Recently played games as a typed frame (app_id, name, playtime_2weeks, playtime_forever[, img_icon_url]).
+        With msgspec installed the body is decoded straight into structs and unused fields are never built.
+        """
+        import polars as pl
 
-    async def get_recently_played_games(self, id64: str) -> pl.DataFrame:
         url = f"{self.BASE_URL}/IPlayerService/GetRecentlyPlayedGames/v1/"
         params = {
             "key": self.api_key,
@@ -87,28 +419,95 @@ class SteamClient:
         }
 
         response = await self._request("GET", url, params=params)
-        games = response.json().get("response", {}).get("games", [])
+        schema = self.recently_played_schema(include_icons)
 
-        return pl.DataFrame(games).rename({'appid': 'app_id'})
+        structs = _steam_structs()
+        if structs is None:
+            games = response.json().get("response", {}).get("games", [])
+            # explicit schema so users without recent games still give a frame with the right columns
+            raw_schema = {('appid' if name == 'app_id' else name): dtype for name, dtype in schema.items()}
+            return pl.from_dicts(games, schema=raw_schema).rename({'appid': 'app_id'})
 
-    async def get_steam_users_raw(self, ids: list[str]) -> list[dict]:
+        decoder = structs.recently_played_with_icon_decoder if include_icons else structs.recently_played_decoder
+        games = decoder.decode(response.content).response.games
+        return pl.DataFrame([structs.astuple(game) for game in games], schema=schema, orient='row')
+
+    async def _fetch_player_summaries(self, ids: list[str], fast: bool = False) -> list:
+        """Raw player dicts, or PlayerActivity structs when fast is set and msgspec is installed."""
         url = f"{self.BASE_URL}/ISteamUser/GetPlayerSummaries/v2/"
-        params = {
-            "key": self.api_key,
-            "steamids": ",".join([str(id) for id in ids]),
-        }
+        structs = _steam_structs() if fast else None
 
-        response = await self._request("GET", url, params=params)
-        players = response.json()["response"]["players"]
-        return players
+        async def fetch(batch: list[str]) -> list:
+            params = {
+                "key": self.api_key,
+                "steamids": ",".join(batch),
+            }
+            response = await self._request("GET", url, params=params)
+            if structs is not None:
+                return structs.player_summaries_decoder.decode(response.content).response.players
+            return response.json()["response"]["players"]
+
+        # steam takes at most 100 ids per call
+        results = await asyncio.gather(*(
+            fetch(ids[i:i + self.MAX_SUMMARY_IDS]) for i in range(0, len(ids), self.MAX_SUMMARY_IDS)
+        ))
+        return [player for batch in results for player in batch]
+
+    async def get_player_activity_frame(self, ids: list[str]) -> pl.DataFrame:
+        """
+        Batch lookup for jobs: steamid, profilestate, personastate and lastlogoff for every id, as a typed frame.
+        Skips the summary cache and pydantic, use get_steam_users for anything user facing.
+        """
+        import polars as pl
+
+        ids = list(dict.fromkeys(str(id) for id in ids))
+        players = await self._fetch_player_summaries(ids, fast=True)
+        structs = _steam_structs()
+        if structs is None:
+            return pl.from_dicts(players, schema=self.player_activity_schema())
+        return pl.DataFrame(
+            [structs.astuple(player) for player in players],
+            schema=self.player_activity_schema(),
+            orient='row',
+        )
+
+    async def get_steam_users_raw(self, ids: list[str]) -> list[dict]:
+        ids = list(dict.fromkeys(str(id) for id in ids))
+        cache = SteamClient._summary_cache
+        if cache is None:
+            return await self._fetch_player_summaries(ids)
+
+        # only the cache misses go to steam
+        players = {}
+        missing = []
+        for id in ids:
+            player = cache.get(id)
+            if player is None:
+                missing.append(id)
+            else:
+                players[id] = player
+
+        if missing:
+            for player in await self._fetch_player_summaries(missing):
+                cache.set(player["steamid"], player)
+                players[player["steamid"]] = player
+
+        return [players[id] for id in ids if id in players]
 
     async def get_steam_users(self, ids: list[str]) -> list[SteamUser]:
+        from steam.models.steam_user import SteamUser
         players = await self.get_steam_users_raw(ids)
         return [SteamUser(**p) for p in players]
 
     async def get_steam_user(self, steam_id: str) -> SteamUser | None:
-        users = await self.get_steam_users([steam_id])
-        return users[0] if users else None
+        batcher = SteamClient._summary_batcher
+        if batcher is None:
+            users = await self.get_steam_users([steam_id])
+            return users[0] if users else None
+
+        from steam.models.steam_user import SteamUser
+        player = await batcher.get(self, str(steam_id))
+        return SteamUser(**player) if player is not None else None
 
     # --------------------------------------------------
     # OpenID
@@ -126,16 +525,17 @@ class SteamClient:
         }
         return f"{cls.STEAM_OPENID_URL}?{urlencode(params)}"
 
-    @classmethod
-    async def verify_steam_openid(cls, params: dict) -> str | None:
+    async def verify_steam_openid(self, params: dict) -> str | None:
         verification_params = dict(params)
         verification_params["openid.mode"] = "check_authentication"
 
-        async with httpx.AsyncClient(timeout=10) as client:
-            response = await client.post(
-                cls.STEAM_OPENID_URL,
-                data=verification_params,
-            )
+        # a double submitted callback verifies the same assertion, let it share one round trip
+        key = ("POST", self.STEAM_OPENID_URL, tuple(sorted(verification_params.items())))
+        response = await self._single_flight(
+            key,
+            urlparse(self.STEAM_OPENID_URL).path,
+            lambda: self.client.post(self.STEAM_OPENID_URL, data=verification_params),
+        )
 
         if "is_valid:true" not in response.text:
             return None
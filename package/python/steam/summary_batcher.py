@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from steam.steam_client import SteamClient
+
+
+class SummaryBatcher:
+    """
+    Collects single steam id lookups for a short window and sends them as one GetPlayerSummaries call.
+    Lookups for an id that is already waiting share its future, a full batch is sent right away.
+    """
+
+    def __init__(self, window: float = 0.01, max_batch: int = 100):
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: dict[str, asyncio.Future] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    async def get(self, client: SteamClient, steam_id: str) -> dict | None:
+        """Raw player summary for steam_id, None when steam doesn't know it."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # whatever was waiting belonged to a loop that is gone, its futures can't be awaited here
+            self._loop, self._pending, self._timer = loop, {}, None
+
+        future = self._pending.get(steam_id)
+        if future is None:
+            future = self._pending[steam_id] = loop.create_future()
+            if len(self._pending) >= self.max_batch:
+                self._flush(client)
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window, self._flush, client)
+
+        return await asyncio.shield(future)
+
+    def _flush(self, client: SteamClient):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, {}
+        if batch:
+            asyncio.ensure_future(self._send(client, batch))
+
+    @staticmethod
+    async def _send(client: SteamClient, batch: dict[str, asyncio.Future]):
+        try:
+            players = await client.get_steam_users_raw(list(batch))
+        except Exception as ex:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(ex)
+            return
+
+        by_id = {player["steamid"]: player for player in players}
+        for steam_id, future in batch.items():
+            if not future.done():
+                future.set_result(by_id.get(steam_id))
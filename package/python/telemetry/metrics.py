@@ -0,0 +1,142 @@
+import json
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Name of the pipeline task currently running, added as a `task` label to everything recorded under it.
+# Context vars follow asyncio tasks, so calls fanned out with gather are still attributed correctly.
+current_task: ContextVar[str | None] = ContextVar("current_task", default=None)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+def _label_key(labels: dict) -> tuple:
+    task = current_task.get()
+    if task is not None and "task" not in labels:
+        labels = {**labels, "task": task}
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(key: tuple, extra: dict | None = None) -> str:
+    pairs = list(key) + sorted((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def summary(self) -> list[dict]:
+        return [{"labels": dict(key), "value": value} for key, value in self.values.items()]
+
+    def to_prometheus(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_format_labels(key)} {value}" for key, value in self.values.items()]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [bucket counts..., +Inf count], sum
+        self.counts: dict[tuple, list[int]] = {}
+        self.sums: dict[tuple, float] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        counts = self.counts.setdefault(key, [0] * (len(self.buckets) + 1))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        counts[-1] += 1
+        self.sums[key] = self.sums.get(key, 0) + value
+
+    def summary(self) -> list[dict]:
+        return [
+            {
+                "labels": dict(key),
+                "count": counts[-1],
+                "sum": self.sums[key],
+                "mean": self.sums[key] / counts[-1] if counts[-1] else 0,
+                "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], counts)),
+            }
+            for key, counts in self.counts.items()
+        ]
+
+    def to_prometheus(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, counts in self.counts.items():
+            for bound, count in zip([str(b) for b in self.buckets] + ["+Inf"], counts):
+                lines.append(f"{self.name}_bucket{_format_labels(key, {'le': bound})} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {self.sums[key]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {counts[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide counters and histograms, dumped once per run as JSON and a Prometheus textfile."""
+
+    def __init__(self):
+        self._metrics: dict[str, Counter | Histogram] = {}
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = Counter(name, help)
+        return metric
+
+    def histogram(self, name: str, help: str = "", buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = Histogram(name, help, buckets)
+        return metric
+
+    def reset(self):
+        self._metrics.clear()
+
+    def summary(self) -> dict:
+        return {name: metric.summary() for name, metric in self._metrics.items()}
+
+    def to_prometheus(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines += metric.to_prometheus()
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _write(path: str, content: str):
+        # textfile collectors read whatever is there, so never expose a half written file
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(content)
+        os.replace(tmp, path)
+
+    def write_json(self, path: str, **extra):
+        self._write(path, json.dumps({**extra, "metrics": self.summary()}, indent=2, default=str))
+
+    def write_prometheus_textfile(self, path: str):
+        self._write(path, self.to_prometheus())
+
+
+@contextmanager
+def task_scope(name: str):
+    """Attribute everything recorded inside the block to task `name`."""
+    token = current_task.set(name)
+    try:
+        yield
+    finally:
+        current_task.reset(token)
+
+
+metrics = MetricsRegistry()